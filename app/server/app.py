@@ -13,13 +13,22 @@ import sqlite3
 import threading
 import shutil
 import logging
+import logging.handlers
+import queue
 import argparse
 import locale
 import concurrent.futures
+import functools
 import traceback
 from urllib.parse import quote, unquote, urlparse, parse_qs
+from http.cookies import SimpleCookie
 import hashlib
+import secrets
 import json
+import random
+import base64
+from uuid import uuid4
+from collections import OrderedDict
 from datetime import timedelta
 
 # 全局异常捕获，写入日志文件
@@ -60,12 +69,20 @@ try:
     from watchdog.observers import Observer
     from watchdog.events import FileSystemEventHandler
     print("[DEBUG] watchdog 导入成功", flush=True)
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
     from werkzeug.middleware.proxy_fix import ProxyFix
     print("[DEBUG] 所有第三方库导入成功", flush=True)
 except ImportError as e:
     print(f"错误：无法导入依赖库。\n详情: {e}", flush=True)
     sys.exit(1)
 
+# orjson 可选：序列化比 stdlib json 快数倍，缺失时回退
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # 计算 www 的绝对路径
 TEMPLATE_DIR = os.path.abspath(os.path.join(BASE_DIR, '../www/templates'))
 STATIC_DIR = os.path.abspath(os.path.join(BASE_DIR, '../www/static'))
@@ -103,6 +120,8 @@ os.makedirs(os.path.dirname(log_file), exist_ok=True)
 DB_PATH = os.path.join(MUSIC_LIBRARY_PATH, 'data.db')
 
 # --- 日志配置 ---
+# 业务线程只往内存队列塞记录，文件/控制台写入由 QueueListener
+# 的独立线程完成，扫描等热循环不再阻塞在日志磁盘 I/O 上
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 logger.handlers.clear()
@@ -110,8 +129,10 @@ file_handler = logging.FileHandler(log_file, mode='w', encoding='utf-8')
 file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+_log_queue = queue.Queue(-1)
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_listener = logging.handlers.QueueListener(_log_queue, file_handler, console_handler, respect_handler_level=True)
+_log_listener.start()
 
 # 过滤 Werkzeug 访问日志，隐藏心跳检测的 200 响应
 class AccessLogFilter(logging.Filter):
@@ -135,10 +156,74 @@ SCAN_STATUS = {
 LIBRARY_VERSION = time.time()
 
 # 辅助: 生成ID
+# 注意: ID 已持久化在 songs/favorites/playlist_songs 中，算法不可更换，
+# 否则历史收藏和歌单会全部失联。这里只做缓存，扫描/监听会反复算同一路径。
+@functools.lru_cache(maxsize=65536)
 def generate_song_id(path):
-    return hashlib.md5(path.encode('utf-8')).hexdigest()
+    return hashlib.md5(path.encode('utf-8'), usedforsecurity=False).hexdigest()
 
 # --- 文件监听器 ---
+# 事件去抖缓冲：同一路径 500ms 窗口内的事件只保留最后一个，
+# 由后台线程统一批量落库，避免阻塞 watchdog 派发线程
+WATCH_DEBOUNCE_WINDOW = 0.5
+
+_WATCH_EVENTS = OrderedDict()  # path -> (action, deadline)
+_WATCH_EVENTS_LOCK = threading.Lock()
+_WATCH_EVENTS_SIGNAL = threading.Event()
+
+def _queue_watch_event(path, action):
+    with _WATCH_EVENTS_LOCK:
+        # 覆盖同路径的旧事件并刷新截止时间 (如 created 后紧跟 deleted)
+        _WATCH_EVENTS.pop(path, None)
+        _WATCH_EVENTS[path] = (action, time.time() + WATCH_DEBOUNCE_WINDOW)
+        _WATCH_EVENTS_SIGNAL.set()
+
+def _drain_watch_events():
+    """后台线程：取出去抖窗口已过期的事件，批量应用到数据库"""
+    global LIBRARY_VERSION
+    while True:
+        _WATCH_EVENTS_SIGNAL.wait()
+        time.sleep(WATCH_DEBOUNCE_WINDOW / 2)
+        now = time.time()
+        due = []
+        with _WATCH_EVENTS_LOCK:
+            for path, (action, deadline) in list(_WATCH_EVENTS.items()):
+                if deadline <= now:
+                    due.append((path, action))
+                    del _WATCH_EVENTS[path]
+            if not _WATCH_EVENTS:
+                _WATCH_EVENTS_SIGNAL.clear()
+        if not due:
+            continue
+
+        to_delete = [p for p, a in due if a == 'deleted']
+        to_index = [p for p, a in due if a == 'created']
+        try:
+            if to_delete:
+                bulk_delete_songs(to_delete)
+                logger.info(f"批量移除索引: {len(to_delete)} 个文件")
+            if to_index:
+                rows = []
+                with get_db() as conn:
+                    for p in to_index:
+                        row = _collect_file_row(p, try_extract_cover=True)
+                        if not row:
+                            continue
+                        # 全局去重检测
+                        dup = conn.execute("SELECT path FROM songs WHERE filename=? AND size=? AND path!=?", (row[2], row[7], p)).fetchone()
+                        if dup:
+                            logger.info(f"索引: 跳过重复文件 {p} (已存在: {dup['path']})")
+                            continue
+                        rows.append(row)
+                if rows:
+                    bulk_upsert_songs(rows)
+                    logger.info(f"批量索引完成: {len(rows)} 个文件")
+            LIBRARY_VERSION = time.time()
+        except Exception as e:
+            logger.error(f"处理文件变更失败: {e}")
+
+threading.Thread(target=_drain_watch_events, daemon=True).start()
+
 class MusicFileEventHandler(FileSystemEventHandler):
     """监听音乐库文件变动"""
     def on_created(self, event):
@@ -156,48 +241,29 @@ class MusicFileEventHandler(FileSystemEventHandler):
         self._process(event.dest_path, 'created')
 
     def _process(self, path, action):
-        global LIBRARY_VERSION
         filename = os.path.basename(path)
-        ext = os.path.splitext(filename)[1].lower()
-        
-        is_audio = ext in AUDIO_EXTS
-        is_misc = ext in ('.lrc', '.jpg', '.jpeg', '.png')
-        
-        if not is_audio and not is_misc:
+        # 绝大多数无关事件在这一次 C 层 endswith 里被过滤掉
+        if not filename.lower().endswith(WATCH_EXTS):
+            return
+        # 删除重试会把占用中的文件改名进 .trash，对应的 moved 事件
+        # 不能当成新文件索引进库（与 _iter_audio_files 的排除一致）
+        if f"{os.sep}.trash{os.sep}" in path:
             return
 
+        ext = os.path.splitext(filename)[1].lower()
+        is_audio = ext in AUDIO_EXTS_SET
+
         logger.info(f"检测到文件变更 [{action}]: {filename}")
-        
-        try:
-            if action == 'created':
-                time.sleep(0.5)
-                if is_audio:
-                    index_single_file(path)
-                elif is_misc:
-                    # 如果是附件，尝试重新索引同名音频文件以更新状态
-                    base = os.path.splitext(path)[0]
-                    for aud in AUDIO_EXTS:
-                        aud_path = base + aud
-                        if os.path.exists(aud_path):
-                            index_single_file(aud_path)
-                            
-            elif action == 'deleted':
-                if is_audio:
-                    with get_db() as conn:
-                        conn.execute("DELETE FROM songs WHERE path=?", (path,))
-                        conn.commit()
-                elif is_misc:
-                    # 附件删除，同样反向更新音频状态
-                    base = os.path.splitext(path)[0]
-                    for aud in AUDIO_EXTS:
-                        aud_path = base + aud
-                        if os.path.exists(aud_path):
-                            index_single_file(aud_path)
-            
-            LIBRARY_VERSION = time.time()
-            
-        except Exception as e:
-            logger.error(f"处理文件变更失败: {e}")
+
+        if is_audio:
+            _queue_watch_event(path, action)
+        else:
+            # 附件变动：重新索引同名音频文件以更新封面/歌词状态
+            base = os.path.splitext(path)[0]
+            for aud in AUDIO_EXTS:
+                aud_path = base + aud
+                if os.path.exists(aud_path):
+                    _queue_watch_event(aud_path, 'created')
 
 # 全局 Observer 实例
 global_observer = None
@@ -231,23 +297,19 @@ def refresh_watchdog_paths():
     
     # 2. 获取目标路径
     # 2. 获取目标路径并去重
-    try:
-        raw_paths = {os.path.abspath(MUSIC_LIBRARY_PATH)}
-        with get_db() as conn:
-            rows = conn.execute("SELECT path FROM mount_points").fetchall()
-            for r in rows: 
-                if r['path']:
-                    raw_paths.add(os.path.abspath(r['path']))
-    except: 
-        raw_paths = {os.path.abspath(MUSIC_LIBRARY_PATH)}
+    raw_paths = {os.path.abspath(MUSIC_LIBRARY_PATH)}
+    for p in get_mount_points():
+        raw_paths.add(os.path.abspath(p))
 
     # 路径规范化与去重 (排除子目录)
-    sorted_paths = sorted(list(raw_paths), key=len)
+    # 排序保证父目录先于子目录出现，但兄弟目录可能插在中间
+    # （如 "Music Videos" 排在 "Music/flac" 前），所以要对所有已
+    # 接受的根逐个判断，目录数很少
     final_targets = []
-    for p in sorted_paths:
-        # 如果当前路径是已添加路径的子目录，则跳过
-        if not any(p.startswith(parent + os.sep) or p == parent for parent in final_targets):
-            final_targets.append(p)
+    for p in sorted(raw_paths):
+        if any(p == t or p.startswith(t + os.sep) for t in final_targets):
+            continue
+        final_targets.append(p)
     
     # 3. 重新添加 schedule
     event_handler = MusicFileEventHandler()
@@ -276,10 +338,9 @@ QQMUSIC_DOWNLOAD_DIR = None
 def get_default_download_dir():
     """获取默认下载目录：优先使用第一个挂载路径，否则使用音乐库目录"""
     try:
-        with get_db() as conn:
-            row = conn.execute("SELECT path FROM mount_points ORDER BY created_at ASC LIMIT 1").fetchone()
-            if row and row['path'] and os.path.exists(row['path']):
-                return row['path']
+        mps = get_mount_points()
+        if mps and os.path.exists(mps[0]):
+            return mps[0]
     except Exception:
         pass
     return MUSIC_LIBRARY_PATH
@@ -290,26 +351,37 @@ app = Flask(__name__, static_folder=STATIC_DIR, template_folder=TEMPLATE_DIR)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 # 配置静态文件缓存过期时间为 1 年 (31536000 秒)
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 31536000
+# 前置 nginx 时设 USE_X_SENDFILE=1：send_file 只发 X-Sendfile 头，
+# 音频/封面字节由 nginx 零拷贝直出，Python 完全退出传输路径。
+# 需要 nginx 配置对应的 internal location 指向音乐库目录；
+# 裸跑（无前置代理）时保持关闭，否则响应会没有正文
+app.use_x_sendfile = os.environ.get('USE_X_SENDFILE', '') in ('1', 'true', 'yes')
 app.secret_key = os.environ.get('APP_SECRET_KEY', 'xiaosongshu_secret')
 app.permanent_session_lifetime = timedelta(days=30)
 
 @app.route('/favicon.ico')
 def favicon():
-    return send_file(os.path.join(STATIC_DIR, 'images', 'ICON_256.PNG'), mimetype='image/png')
+    # 交给静态文件处理器：走 wsgi.file_wrapper (Linux 上即 sendfile)，
+    # 并复用静态资源的一年缓存头，避免每次页面加载经 Python 读字节
+    return redirect(url_for('static', filename='images/ICON_256.PNG'))
 
 APP_AUTH_PASSWORD = args.password  # 管理员密码
+# 管理员密码哈希只算一次，后续全部用这个常量比较
+ADMIN_HASH = hashlib.sha256(APP_AUTH_PASSWORD.encode()).hexdigest() if APP_AUTH_PASSWORD else None
 
 # --- 多用户系统 ---
 USER_DATA_DIR = os.path.join(MUSIC_LIBRARY_PATH, 'user_data')
 os.makedirs(USER_DATA_DIR, exist_ok=True)
 
+# 预编译的字符类检测，C 层扫描代替逐字符生成器
+_HAS_LETTER = re.compile(r'[^\W\d_]').search
+_HAS_DIGIT = re.compile(r'\d').search
+
 def validate_password(password: str) -> tuple:
     """验证密码格式：6位以上，必须包含数字和字母"""
     if len(password) < 6:
         return False, '密码必须至少6位'
-    has_letter = any(c.isalpha() for c in password)
-    has_digit = any(c.isdigit() for c in password)
-    if not has_letter or not has_digit:
+    if not _HAS_LETTER(password) or not _HAS_DIGIT(password):
         return False, '密码必须包含数字和字母'
     return True, ''
 
@@ -317,28 +389,79 @@ def get_user_file_path(password_hash: str) -> str:
     """获取用户数据文件路径"""
     return os.path.join(USER_DATA_DIR, f"{password_hash[:16]}.json")
 
+# 用户数据常驻内存: hash -> 数据，磁盘仅作持久化存储。
+# 启动时全量加载，认证热路径不再碰磁盘。
+_USER_CACHE = {}
+_USER_CACHE_LOCK = threading.RLock()
+
+def _loads_user_json(raw: bytes) -> dict:
+    if orjson:
+        return orjson.loads(raw)
+    return json.loads(raw.decode('utf-8'))
+
+def _dumps_user_json(data: dict) -> bytes:
+    # 紧凑输出：用户数据文件不供人读，缩进只是白白增加字节和编码时间
+    if orjson:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
 def load_user_data(password_hash: str) -> dict:
-    """加载用户数据"""
+    """加载用户数据（内存优先，未命中时回读磁盘）"""
+    with _USER_CACHE_LOCK:
+        data = _USER_CACHE.get(password_hash)
+        if data is not None:
+            return data
     file_path = get_user_file_path(password_hash)
     if os.path.exists(file_path):
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(file_path, 'rb') as f:
+                data = _loads_user_json(f.read())
+            with _USER_CACHE_LOCK:
+                _USER_CACHE[password_hash] = data
+            return data
         except Exception:
             pass
     return None
 
 def save_user_data(password_hash: str, data: dict):
-    """保存用户数据"""
+    """保存用户数据（更新内存，写透磁盘：临时文件 + 原子替换）"""
     file_path = get_user_file_path(password_hash)
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with _USER_CACHE_LOCK:
+            _USER_CACHE[password_hash] = data
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_dumps_user_json(data))
+        os.replace(tmp_path, file_path)
         return True
     except Exception as e:
         logger.error(f"保存用户数据失败: {e}")
         return False
 
+def _seed_user_cache():
+    """启动时把所有用户数据装入内存"""
+    count = 0
+    try:
+        for fname in os.listdir(USER_DATA_DIR):
+            if not fname.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(USER_DATA_DIR, fname), 'rb') as f:
+                    data = _loads_user_json(f.read())
+                phash = data.get('password_hash')
+                if phash:
+                    with _USER_CACHE_LOCK:
+                        _USER_CACHE[phash] = data
+                    count += 1
+            except Exception:
+                continue
+    except Exception as e:
+        logger.warning(f"加载用户数据目录失败: {e}")
+    if count:
+        logger.info(f"已加载 {count} 个用户到内存")
+
+_seed_user_cache()
+
 def create_user(password_hash: str, is_admin: bool = False) -> dict:
     """创建新用户"""
     user_data = {
@@ -360,11 +483,10 @@ def get_current_user() -> dict:
 
 def init_admin_user():
     """初始化管理员用户"""
-    if not APP_AUTH_PASSWORD:
+    if not ADMIN_HASH:
         return
-    admin_hash = hashlib.sha256(APP_AUTH_PASSWORD.encode()).hexdigest()
-    if not load_user_data(admin_hash):
-        create_user(admin_hash, is_admin=True)
+    if not load_user_data(ADMIN_HASH):
+        create_user(ADMIN_HASH, is_admin=True)
         logger.info("管理员用户已创建")
 
 # 启动时初始化管理员
@@ -375,41 +497,41 @@ def _auth_failed():
         return jsonify({'success': False, 'error': 'unauthorized'}), 401
     return redirect(url_for('login', next=request.path))
 
+# 认证白名单前缀 (模块级元组: str.startswith 接受元组，C 层一次完成匹配)
+# 静态资源和登录/注册页面不需要认证
+_NO_AUTH_PREFIXES = ('/static', '/login', '/register')
+
+# 预览功能允许的 API 路径（用于 CGI 代理和移动端 APP）
+_PREVIEW_API_PREFIXES = (
+    '/api/music/external/meta',
+    '/api/music/external/stream',
+    '/api/music/external/cover',
+    '/api/favorites',
+    '/api/songs',
+    '/api/playlists',
+    '/api/lyrics',
+    '/api/qqmusic/search',
+    '/api/qqmusic/song/url',
+    '/api/netease/search',
+)
+
+# 外部点歌 API 白名单（无需认证）
+_EXTERNAL_API_PREFIXES = (
+    '/api/qqmusic/search',
+    '/api/qqmusic/song/url',
+    '/api/netease/search',
+)
+
 @app.before_request
 def require_auth():
     path = request.path or ''
-    # 静态资源和登录/注册页面不需要认证
-    if path.startswith('/static') or path.startswith('/login') or path.startswith('/register') or path == '/favicon.ico':
+    if path.startswith(_NO_AUTH_PREFIXES) or path == '/favicon.ico':
         return
-    
-    # 预览功能允许的 API 路径（用于 CGI 代理和移动端 APP）
-    preview_allowed_paths = [
-        '/api/music/external/meta',
-        '/api/music/external/stream',
-        '/api/music/external/cover',
-        '/api/favorites',
-        '/api/songs',
-        '/api/playlists',
-        '/api/lyrics',
-        '/api/qqmusic/search',
-        '/api/qqmusic/song/url',
-        '/api/netease/search',
-    ]
-    
-    # 检查是否是预览相关的 API 请求
-    is_preview_api = any(path.startswith(p) for p in preview_allowed_paths)
-    
-    # 外部点歌 API 白名单（无需认证）
-    external_api_paths = [
-        '/api/qqmusic/search',
-        '/api/qqmusic/song/url',
-        '/api/netease/search',
-    ]
-    is_external_api = any(path.startswith(p) for p in external_api_paths)
-    if is_external_api:
+
+    if path.startswith(_EXTERNAL_API_PREFIXES):
         return  # 允许外部直接访问搜索和播放链接 API
-    
-    if is_preview_api:
+
+    if path.startswith(_PREVIEW_API_PREFIXES):
         # 来自 CGI 代理的请求（通过 X-Forwarded-Prefix 识别）
         forwarded_prefix = request.headers.get('X-Forwarded-Prefix', '')
         if 'index.cgi' in forwarded_prefix:
@@ -508,11 +630,55 @@ def get_user_info():
     })
 
 # --- 数据库管理 ---
-def get_db():
-    conn = sqlite3.connect(DB_PATH, timeout=30.0, check_same_thread=False)
+# journal_mode=WAL 持久化在数据库文件上，只需设置一次
+_WAL_ENABLED = False
+
+# 每个线程复用一条长连接：sqlite3.connect 每次要解析 schema/分配 pager，
+# 热路径上反复开关连接开销可观
+_DB_LOCAL = threading.local()
+
+def _new_db_connection():
+    global _WAL_ENABLED
+    # isolation_level=None: 自动提交模式，批量操作用显式 BEGIN 控制事务
+    conn = sqlite3.connect(DB_PATH, timeout=30.0, check_same_thread=False, isolation_level=None)
     conn.row_factory = sqlite3.Row
+    try:
+        if not _WAL_ENABLED:
+            conn.execute("PRAGMA journal_mode=WAL")
+            _WAL_ENABLED = True
+        # 写入走 WAL 后 NORMAL 已足够安全，省掉每次提交的 fsync
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA busy_timeout=30000")
+        # 限制 WAL 文件增长，批量写入期间按 1000 页自动检查点
+        conn.execute("PRAGMA wal_autocheckpoint=1000")
+    except Exception as e:
+        logger.warning(f"设置 SQLite PRAGMA 失败: {e}")
+    return conn
+
+def get_db(row_factory=sqlite3.Row):
+    conn = getattr(_DB_LOCAL, 'conn', None)
+    if conn is None:
+        conn = _new_db_connection()
+        _DB_LOCAL.conn = conn
+    # 大批量只按位置取列的读路径可传 row_factory=None 拿原生元组，
+    # 省掉 sqlite3.Row 的按名索引开销
+    if conn.row_factory is not row_factory:
+        conn.row_factory = row_factory
     return conn
 
+@app.teardown_appcontext
+def _rollback_idle_txn(exc):
+    """连接跨请求复用，请求中途异常可能留下未结事务，这里兜底回滚。"""
+    conn = getattr(_DB_LOCAL, 'conn', None)
+    if conn is not None and conn.in_transaction:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+
 def init_db():
     def _init_db_core():
         with get_db() as conn:
@@ -542,6 +708,16 @@ def init_db():
                    created_at REAL
                 )
             ''')
+            # 按用户隔离的收藏表：增删收藏走单行写，
+            # 不再整份重写用户 JSON（老数据首次访问时迁移）
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS user_favorites (
+                   user_hash TEXT,
+                   song_id TEXT,
+                   created_at REAL,
+                   PRIMARY KEY (user_hash, song_id)
+                )
+            ''')
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS mount_points (
                     path TEXT PRIMARY KEY,
@@ -626,11 +802,26 @@ def init_db():
             except: pass
             
             # 清理错误索引的非音频文件
+            # (必须是所有扩展名都不匹配才删除，OR 连接会把全表删光)
             try:
-                placeholders = ' OR '.join([f"filename NOT LIKE '%{ext}'" for ext in AUDIO_EXTS])
-                conn.execute(f"DELETE FROM songs WHERE {placeholders}")
+                cond = ' AND '.join(["LOWER(filename) NOT LIKE ?"] * len(AUDIO_EXTS))
+                params = tuple('%' + ext for ext in AUDIO_EXTS)
+                bad_count = conn.execute(f"SELECT COUNT(*) FROM songs WHERE {cond}", params).fetchone()[0]
+                if bad_count:
+                    conn.execute(f"DELETE FROM songs WHERE {cond}", params)
             except: pass
-            
+
+            # 查询索引 (path 的索引由 UNIQUE 约束自动创建)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_songs_artist ON songs(artist)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_songs_album ON songs(album)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_songs_fname_size ON songs(filename, size)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_songs_title_artist_size ON songs(title, artist, size)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_playlist_songs_pid ON playlist_songs(playlist_id, sort_order)")
+            # 让查询计划器了解各索引的分布
+            try:
+                conn.execute("ANALYZE")
+            except: pass
+
             conn.commit()
 
     try:
@@ -663,39 +854,73 @@ def _is_valid_metadata(value):
         return False
     return True
 
-def get_metadata(file_path):
+def parse_audio_file(file_path):
+    """解析音频文件，返回 mutagen File 对象（失败返回 None）。
+
+    供调用方在元数据/封面/歌词提取之间复用，避免同一文件被 mutagen
+    反复解析（每次都要重新读容器头）。
+    """
+    try:
+        return File(file_path)
+    except Exception as e:
+        logger.warning(f"文件 {file_path} 无法解析，可能已损坏: {e}")
+        return None
+
+# 非 easy 模式下各容器的标签键映射
+_ID3_TAG_MAP = {'title': 'TIT2', 'artist': 'TPE1', 'album': 'TALB'}
+_MP4_TAG_MAP = {'title': '\xa9nam', 'artist': '\xa9ART', 'album': '\xa9alb'}
+
+def _raw_tag_from_audio(audio, key):
+    """从已解析的 mutagen 对象读取标签值（兼容 ID3/MP4/Vorbis 等）"""
+    tags = getattr(audio, 'tags', None)
+    if not tags:
+        return None
+    try:
+        if isinstance(tags, ID3):
+            frame = tags.get(_ID3_TAG_MAP[key])
+            if frame is not None and getattr(frame, 'text', None):
+                return str(frame.text[0])
+            return None
+        val = tags.get(key)
+        if val is None and hasattr(tags, 'get'):
+            val = tags.get(key.upper()) or tags.get(_MP4_TAG_MAP[key])
+        if isinstance(val, (list, tuple)):
+            val = val[0] if val else None
+        # 确保返回字符串类型（处理 ASFUnicodeAttribute 等特殊类型）
+        return str(val) if val is not None else None
+    except Exception:
+        return None
+
+def get_metadata(file_path, audio=None):
+    """提取标签元数据。audio 可传入已解析的 mutagen File 对象以复用解析结果。"""
     metadata = {'title': None, 'artist': None, 'album': None}
     try:
-        audio = None
-        try:
-            audio = EasyID3(file_path)
-        except Exception as e1:
+        if audio is None:
             try:
-                audio = File(file_path, easy=True)
-            except Exception as e2:
+                audio = EasyID3(file_path)
+            except Exception:
                 try:
-                    # 最后尝试不使用 easy 模式
-                    audio = File(file_path)
-                except Exception as e3:
-                    # 文件可能损坏，跳过元数据提取
-                    logger.warning(f"文件 {file_path} 无法解析，可能已损坏: {e3}")
-                    audio = None
+                    audio = File(file_path, easy=True)
+                except Exception:
+                    audio = parse_audio_file(file_path)
         if audio:
             def get_tag(key):
-                if hasattr(audio, 'get'):
-                    val = audio.get(key)
-                    if isinstance(val, list): 
-                        val = val[0] if val else None
-                    # 确保返回字符串类型（处理 ASFUnicodeAttribute 等特殊类型）
-                    if val is not None:
-                        return str(val)
-                    return val
-                return None
+                # easy 模式对象和 Vorbis 标签直接支持 'title' 等通用键，
+                # 其余格式 (裸 ID3/MP4) 走 _raw_tag_from_audio 的键映射
+                try:
+                    val = audio.get(key) if hasattr(audio, 'get') else None
+                except Exception:
+                    val = None
+                if isinstance(val, (list, tuple)):
+                    val = val[0] if val else None
+                if val is not None:
+                    return str(val)
+                return _raw_tag_from_audio(audio, key)
             # 获取元数据，但过滤无效值
             title_val = get_tag('title')
             artist_val = get_tag('artist')
             album_val = get_tag('album')
-            
+
             metadata['title'] = title_val if _is_valid_metadata(title_val) else None
             metadata['artist'] = artist_val if _is_valid_metadata(artist_val) else None
             metadata['album'] = album_val if _is_valid_metadata(album_val) else None
@@ -731,8 +956,11 @@ def get_metadata(file_path):
     logger.debug(f"文件 {file_path} 元数据: {metadata}")
     return metadata
 
-def extract_embedded_cover(file_path: str, base_name: str = None, target_dir: str = None):
-    """提取音频内嵌封面并保存为 covers/<base_name>.jpg，成功返回 True。"""
+def extract_embedded_cover(file_path: str, base_name: str = None, target_dir: str = None, audio=None):
+    """提取音频内嵌封面并保存为 covers/<base_name>.jpg，成功返回 True。
+
+    audio 可传入已解析的 mutagen File 对象，避免重复解析。
+    """
     try:
         if not os.path.exists(file_path):
             return False
@@ -743,9 +971,11 @@ def extract_embedded_cover(file_path: str, base_name: str = None, target_dir: st
         os.makedirs(cover_dir, exist_ok=True)
         target_path = os.path.join(cover_dir, f"{base_name}.jpg")
         if os.path.exists(target_path):
+            _remember_cover_stem(base_name)
             return True
 
-        audio = File(file_path)
+        if audio is None:
+            audio = File(file_path)
         if not audio:
             return False
 
@@ -779,19 +1009,25 @@ def extract_embedded_cover(file_path: str, base_name: str = None, target_dir: st
 
         with open(target_path, 'wb') as f:
             f.write(data)
+        _remember_cover_stem(base_name)
+        _dir_index_invalidate(cover_dir)
         logger.info(f"内嵌封面提取并保存: {target_path}")
         return True
     except Exception as e:
         logger.warning(f"提取内嵌封面失败: {file_path}, 错误: {repr(e)}")
         return False
 
-def extract_embedded_lyrics(file_path: str):
-    """提取音频内嵌歌词，返回歌词字符串或 None。"""
+def extract_embedded_lyrics(file_path: str, audio=None):
+    """提取音频内嵌歌词，返回歌词字符串或 None。
+
+    audio 可传入已解析的 mutagen File 对象，避免重复解析。
+    """
     try:
         if not os.path.exists(file_path):
             return None
-        
-        audio = File(file_path)
+
+        if audio is None:
+            audio = File(file_path)
         if not audio:
             return None
 
@@ -815,60 +1051,271 @@ def extract_embedded_lyrics(file_path: str):
         logger.warning(f"提取内嵌歌词失败: {file_path}, 错误: {repr(e)}")
     return None
 
+@functools.lru_cache(maxsize=2048)
+def _embedded_lyrics_cached(path, mtime_ns, size):
+    """按 (path, mtime, size) 缓存内嵌歌词提取结果。
+
+    同一首歌的歌词请求不再每次重新解析整份音频标签；未命中也缓存
+    （空串），文件一改动 key 变化自动失效。"""
+    return extract_embedded_lyrics(path) or ''
+
 # --- 通用请求头 (提前定义，供后续函数使用) ---
 COMMON_HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
     'Authorization': '2FMusic'
 }
 
+# 网易云 API 会话：连接池 + keep-alive，歌单导入时成百上千次调用
+# 不必每次重付 TCP/TLS 握手
+_NETEASE_SESSION = requests.Session()
+_netease_adapter = HTTPAdapter(pool_connections=20, pool_maxsize=40,
+                               max_retries=Retry(total=2, backoff_factor=0.2))
+_NETEASE_SESSION.mount('http://', _netease_adapter)
+_NETEASE_SESSION.mount('https://', _netease_adapter)
+_NETEASE_SESSION.headers.update(COMMON_HEADERS)
+
+# 歌词/封面外部 API 会话：连接池 + keep-alive，省掉每次请求的 TLS 握手。
+# 配套一个小线程池，把主/备 API 并发发出去，先成功者先用
+_EXT_API_SESSION = requests.Session()
+_ext_adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16)
+_EXT_API_SESSION.mount('http://', _ext_adapter)
+_EXT_API_SESSION.mount('https://', _ext_adapter)
+_EXT_API_SESSION.headers.update(COMMON_HEADERS)
+_EXT_API_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix='ext-api')
+
+def _load_http_meta(save_path):
+    """读取缓存文件的 ETag/Last-Modified 边车，构造条件请求头。"""
+    try:
+        with open(save_path + '.meta.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers or None
+    except Exception:
+        return None
+
+def _save_http_meta(save_path, resp):
+    """把 200 响应的 ETag/Last-Modified 存到边车文件，供下次条件请求。"""
+    try:
+        meta = {}
+        if resp.headers.get('ETag'):
+            meta['etag'] = resp.headers['ETag']
+        if resp.headers.get('Last-Modified'):
+            meta['last_modified'] = resp.headers['Last-Modified']
+        if meta:
+            with open(save_path + '.meta.json', 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+    except Exception:
+        pass
+
+# 失败结果负缓存: 远端没有歌词/封面的歌，每次页面渲染都要白付两个
+# API 的完整超时。按 (artist, title) 记住失败，短期内直接短路
+_NEG_CACHE_TTL = 3600.0
+_NEG_CACHE_MAX = 10000
+_NEG_LYRICS = OrderedDict()
+_NEG_COVERS = OrderedDict()
+_NEG_CACHE_LOCK = threading.Lock()
+
+def _neg_cache_hit(cache, key):
+    with _NEG_CACHE_LOCK:
+        ts = cache.get(key)
+        if ts is None:
+            return False
+        if time.monotonic() - ts >= _NEG_CACHE_TTL:
+            del cache[key]
+            return False
+        cache.move_to_end(key)
+        return True
+
+def _neg_cache_put(cache, key):
+    with _NEG_CACHE_LOCK:
+        cache[key] = time.monotonic()
+        cache.move_to_end(key)
+        while len(cache) > _NEG_CACHE_MAX:
+            cache.popitem(last=False)
+
+def _race_first_ok(api_urls, check, what, headers=None):
+    """并发请求一组等价 API（主/备），返回最先通过 check 的响应。
+
+    串行逐个试 + 3 秒超时的老写法最坏要 6 秒才放弃；并发后最坏时延
+    等于单个请求，慢的那个在后台自然结束。
+    """
+    labels = ('主API', '备用API')
+
+    def _fetch(idx):
+        api_url = api_urls[idx]
+        label = labels[idx] if idx < len(labels) else f"API{idx}"
+        safe_url = _HOST_RE.sub(f'[{label}]', api_url)
+        logger.info(f"请求网络{what}API: {safe_url}")
+        resp = _EXT_API_SESSION.get(api_url, timeout=3, headers=headers)
+        if check(resp):
+            return resp
+        logger.warning(f"{what}API响应异常: {safe_url}, 状态码: {resp.status_code}")
+        return None
+
+    futures = [_EXT_API_POOL.submit(_fetch, i) for i in range(len(api_urls))]
+    try:
+        for fut in concurrent.futures.as_completed(futures, timeout=10):
+            try:
+                resp = fut.result()
+            except Exception:
+                continue
+            if resp is not None:
+                for other in futures:
+                    other.cancel()
+                return resp
+    except concurrent.futures.TimeoutError:
+        pass
+    return None
+
+# 后台补抓池：本地没有歌词/封面时把外网抓取挪到后台执行，
+# HTTP 请求立刻返回 pending，不再陪外网等满超时占死 WSGI 工作线程
+_FETCH_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix='bg-fetch')
+_INFLIGHT = {}  # (kind, artist, title) -> Future
+_INFLIGHT_LOCK = threading.Lock()
+
+def _submit_fetch(kind, artist, title, fn):
+    """同一 (kind, artist, title) 只保留一个在飞的后台任务，返回其 Future。"""
+    key = (kind, artist or '', title)
+    with _INFLIGHT_LOCK:
+        fut = _INFLIGHT.get(key)
+        if fut is None or fut.done():
+            fut = _FETCH_POOL.submit(fn)
+            _INFLIGHT[key] = fut
+        # 已结束的条目攒多了就顺手清掉，避免字典无限增长
+        if len(_INFLIGHT) > 1000:
+            for k in [k for k, f in _INFLIGHT.items() if f.done() and k != key]:
+                _INFLIGHT.pop(k, None)
+        return fut
+
+# 封面字节 LRU：同一专辑/歌单批量下载时封面 URL 高度重复，
+# 命中即省一次完整下载。条目是整张图，容量给小一点
+_COVER_BYTES_CACHE = OrderedDict()  # url -> bytes
+_COVER_BYTES_LOCK = threading.Lock()
+_COVER_BYTES_MAX = 128
+_COVER_MAX_BYTES = 10 * 1024 * 1024  # 单张封面大小上限
+
 def fetch_cover_bytes(url: str):
     if not url:
         return None
+    with _COVER_BYTES_LOCK:
+        cached = _COVER_BYTES_CACHE.get(url)
+        if cached is not None:
+            _COVER_BYTES_CACHE.move_to_end(url)
+            return cached
     try:
-        resp = requests.get(url, timeout=8, headers=COMMON_HEADERS)
-        if resp.status_code == 200 and resp.content:
-            return resp.content
+        # 复用网易云会话的连接池，封面多为同一 CDN，省掉重复 TLS 握手。
+        # 流式读取并设 10MB 上限：坏链接/异常响应不至于把内存吃穿
+        with _NETEASE_SESSION.get(url, timeout=8, stream=True) as resp:
+            if resp.status_code != 200:
+                return None
+            declared = resp.headers.get('content-length')
+            if declared and declared.isdigit() and int(declared) > _COVER_MAX_BYTES:
+                logger.warning(f"封面过大已跳过: {url} ({declared} 字节)")
+                return None
+            buf = bytearray()
+            for chunk in resp.iter_content(65536):
+                buf += chunk
+                if len(buf) > _COVER_MAX_BYTES:
+                    logger.warning(f"封面超出大小上限已中止: {url}")
+                    return None
+        if buf:
+            data = bytes(buf)
+            with _COVER_BYTES_LOCK:
+                _COVER_BYTES_CACHE[url] = data
+                _COVER_BYTES_CACHE.move_to_end(url)
+                while len(_COVER_BYTES_CACHE) > _COVER_BYTES_MAX:
+                    _COVER_BYTES_CACHE.popitem(last=False)
+            return data
     except Exception as e:
         logger.warning(f"封面下载失败: {url}, 错误: {e}")
     return None
 
-def embed_cover_to_file(audio_path: str, cover_bytes: bytes):
-    """将封面嵌入音频文件（支持 mp3/flac/m4a）。"""
-    if not cover_bytes or not os.path.exists(audio_path):
+def _lyrics_unchanged(existing, lrc_text):
+    # 歌词与现有内容一致时跳过写入：ID3 padding 不足时 .save()
+    # 会整文件重写，对带大封面的文件是兆级别的无谓 I/O
+    if not existing:
+        return False
+    val = existing[0] if isinstance(existing, (list, tuple)) else existing
+    return str(val) == lrc_text
+
+def embed_tags_to_file(audio_path: str, cover_bytes: bytes = None, lrc_text: str = None):
+    """封面与歌词一次打开、一次保存地嵌入音频。
+
+    mutagen 打开要整读帧表，保存时 padding 不足还会整文件重写；
+    封面和歌词各开各存等于把这笔 I/O 付两遍，合并后只付一遍。
+    封面支持 mp3/flac/m4a，歌词另外支持 ogg。"""
+    if not os.path.exists(audio_path) or (not cover_bytes and not lrc_text):
         return
     ext = os.path.splitext(audio_path)[1].lower()
     try:
         if ext == '.mp3':
-            audio = None
             try:
-                audio = ID3(audio_path)
+                tags = ID3(audio_path)
             except Exception:
-                audio = File(audio_path)
-                audio.add_tags()
-                audio.save()
-                audio = ID3(audio_path)
-            if audio:
-                audio.delall('APIC')
-                audio.add(APIC(mime='image/jpeg', type=3, desc='Cover', data=cover_bytes))
-                audio.save()
+                tags = File(audio_path)
+                tags.add_tags()
+                tags.save()
+                tags = ID3(audio_path)
+            dirty = False
+            if cover_bytes:
+                tags.delall('APIC')
+                tags.add(APIC(mime='image/jpeg', type=3, desc='Cover', data=cover_bytes))
+                dirty = True
+            if lrc_text and not any(getattr(u, 'text', None) == lrc_text
+                                    for u in tags.getall('USLT')):
+                tags.delall('USLT')
+                tags.add(USLT(encoding=3, lang='chi', desc='Lyric', text=lrc_text))
+                dirty = True
+            if dirty:
+                tags.save()
         elif ext == '.flac':
             audio = FLAC(audio_path)
-            pic = Picture()
-            pic.data = cover_bytes
-            pic.type = 3
-            pic.mime = 'image/jpeg'
-            audio.clear_pictures()
-            audio.add_picture(pic)
-            audio.save()
+            dirty = False
+            if cover_bytes:
+                pic = Picture()
+                pic.data = cover_bytes
+                pic.type = 3
+                pic.mime = 'image/jpeg'
+                audio.clear_pictures()
+                audio.add_picture(pic)
+                dirty = True
+            if lrc_text and not _lyrics_unchanged(audio.get('LYRICS'), lrc_text):
+                audio['LYRICS'] = lrc_text
+                dirty = True
+            if dirty:
+                audio.save()
         elif ext in ('.m4a', '.m4b', '.m4p'):
             audio = MP4(audio_path)
-            fmt = MP4Cover.FORMAT_JPEG
-            if cover_bytes.startswith(b'\x89PNG'):
-                fmt = MP4Cover.FORMAT_PNG
-            audio['covr'] = [MP4Cover(cover_bytes, fmt)]
-            audio.save()
+            dirty = False
+            if cover_bytes:
+                fmt = MP4Cover.FORMAT_JPEG
+                if cover_bytes.startswith(b'\x89PNG'):
+                    fmt = MP4Cover.FORMAT_PNG
+                audio['covr'] = [MP4Cover(cover_bytes, fmt)]
+                dirty = True
+            if lrc_text and not _lyrics_unchanged(
+                    audio.tags.get('\xa9lyr') if audio.tags else None, lrc_text):
+                audio['\xa9lyr'] = lrc_text
+                dirty = True
+            if dirty:
+                audio.save()
+        elif ext in ('.ogg', '.oga'):
+            if lrc_text:
+                audio = File(audio_path)
+                if not _lyrics_unchanged(audio.get('LYRICS'), lrc_text):
+                    audio['LYRICS'] = lrc_text
+                    audio.save()
     except Exception as e:
-        logger.warning(f"内嵌封面失败: {audio_path}, 错误: {e}")
+        logger.warning(f"内嵌标签失败: {audio_path}, 错误: {e}")
+
+def embed_cover_to_file(audio_path: str, cover_bytes: bytes):
+    """将封面嵌入音频文件（支持 mp3/flac/m4a）。"""
+    if cover_bytes:
+        embed_tags_to_file(audio_path, cover_bytes=cover_bytes)
 
 def save_cover_file(cover_bytes: bytes, base_name: str, target_dir: str = None):
     """保存封面文件到指定目录或默认目录"""
@@ -910,106 +1357,404 @@ def fetch_netease_lyrics(song_id: str):
 
 def embed_lyrics_to_file(audio_path: str, lrc_text: str):
     """将歌词嵌入音频（行级歌词）。"""
-    if not lrc_text or not os.path.exists(audio_path):
-        return
-    ext = os.path.splitext(audio_path)[1].lower()
+    if lrc_text:
+        embed_tags_to_file(audio_path, lrc_text=lrc_text)
+
+AUDIO_EXTS = ('.mp3', '.wav', '.ogg', '.flac', '.aac', '.m4a')
+# 监听事件过滤: frozenset 做 O(1) 成员判断，合并元组给 C 层 endswith 早退
+AUDIO_EXTS_SET = frozenset(AUDIO_EXTS)
+# 遍历热循环用的裸扩展名（不带点）：rpartition('.') 只分配几个字符的
+# 扩展名小串做 lower，避免对每个完整文件名做一次 .lower() 拷贝
+_AUDIO_EXT_BARE = frozenset(e[1:] for e in AUDIO_EXTS)
+MISC_EXTS = ('.lrc', '.jpg', '.jpeg', '.png')
+MISC_EXTS_SET = frozenset(MISC_EXTS)
+WATCH_EXTS = AUDIO_EXTS + MISC_EXTS
+
+# 挂载点内存缓存：check_cover_exists 在扫描工作线程里按文件调用，
+# 不能让每个文件都去数据库查一遍 mount_points
+_MOUNT_POINTS_CACHE = None
+_MOUNT_POINTS_LOCK = threading.Lock()
+
+def get_mount_points(refresh=False):
+    """返回挂载点路径列表 (按 created_at 升序)，带进程内缓存。"""
+    global _MOUNT_POINTS_CACHE
+    if not refresh:
+        cached = _MOUNT_POINTS_CACHE
+        if cached is not None:
+            return cached
     try:
-        if ext == '.mp3':
-            try:
-                tags = ID3(audio_path)
-            except Exception:
-                tags = File(audio_path)
-                tags.add_tags()
-                tags.save()
-                tags = ID3(audio_path)
-            tags.delall('USLT')
-            tags.add(USLT(encoding=3, lang='chi', desc='Lyric', text=lrc_text))
-            tags.save()
-        elif ext == '.flac':
-            audio = FLAC(audio_path)
-            audio['LYRICS'] = lrc_text
-            audio.save()
-        elif ext in ('.m4a', '.m4b', '.m4p'):
-            audio = MP4(audio_path)
-            audio['\xa9lyr'] = lrc_text
-            audio.save()
-        elif ext in ('.ogg', '.oga'):
-            audio = File(audio_path)
-            audio['LYRICS'] = lrc_text
-            audio.save()
+        with get_db(row_factory=None) as conn:
+            rows = conn.execute("SELECT path FROM mount_points ORDER BY created_at ASC").fetchall()
+            paths = [r[0] for r in rows if r[0]]
+    except Exception:
+        paths = []
+    with _MOUNT_POINTS_LOCK:
+        _MOUNT_POINTS_CACHE = paths
+    return paths
+
+# 常驻歌曲索引: filename→path 与 (filename,size)→path 两张哈希表，把
+# 各接口按文件名的单行 SELECT 变成进程内查表。写入路径 (批量 upsert /
+# 单文件索引) 同步登记，删除尽力清理，整库扫描结束后全量重建；正向
+# 命中后调用方仍用 os.path.exists 兜底，所以残留项不会造成误判
+_SONG_INDEX_LOCK = threading.Lock()
+_SONG_BY_FILENAME = {}
+_SONG_BY_FSIZE = {}
+
+def _song_index_add(filename, path, size):
+    with _SONG_INDEX_LOCK:
+        _SONG_BY_FILENAME[filename] = path
+        _SONG_BY_FSIZE[(filename, size)] = path
+
+def _song_index_discard(path):
+    name = os.path.basename(path)
+    with _SONG_INDEX_LOCK:
+        if _SONG_BY_FILENAME.get(name) == path:
+            del _SONG_BY_FILENAME[name]
+
+def _song_path_by_fsize(filename, size):
+    with _SONG_INDEX_LOCK:
+        return _SONG_BY_FSIZE.get((filename, size))
+
+def _resolve_song_path(name):
+    """按文件名解析库内路径：先查内存索引，索引未初始化时退回数据库。"""
+    with _SONG_INDEX_LOCK:
+        seeded = bool(_SONG_BY_FILENAME)
+        path = _SONG_BY_FILENAME.get(name)
+    if path or seeded:
+        return path
+    try:
+        with get_db() as conn:
+            row = conn.execute("SELECT path FROM songs WHERE filename=?", (name,)).fetchone()
+            return row['path'] if row else None
     except Exception as e:
-        logger.warning(f"内嵌歌词失败: {audio_path}, 错误: {e}")
+        logger.warning(f"查询歌曲路径失败: {e}")
+        return None
 
-AUDIO_EXTS = ('.mp3', '.wav', '.ogg', '.flac', '.aac', '.m4a')
+def _seed_song_index(rebuild=False):
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        rows = cursor.execute("SELECT filename, path, size FROM songs").fetchall()
+        with _SONG_INDEX_LOCK:
+            if rebuild:
+                _SONG_BY_FILENAME.clear()
+                _SONG_BY_FSIZE.clear()
+            for name, path, size in rows:
+                _SONG_BY_FILENAME[name] = path
+                _SONG_BY_FSIZE[(name, size)] = path
+    except Exception as e:
+        logger.warning(f"预载歌曲索引失败: {e}")
+
+# 已知存在封面的主名集合：扫描遍历和内嵌提取时登记，让单文件路径
+# (watchdog/index_single_file) 的封面检测命中时只需一次集合查找，
+# 不必对每个挂载点都 stat 一遍 covers/<主名>.jpg
+_KNOWN_COVER_STEMS = set()
+_KNOWN_COVER_STEMS_LOCK = threading.Lock()
+
+def _remember_cover_stem(base_name):
+    with _KNOWN_COVER_STEMS_LOCK:
+        _KNOWN_COVER_STEMS.add(base_name)
+
+def _forget_cover_stem(base_name):
+    with _KNOWN_COVER_STEMS_LOCK:
+        _KNOWN_COVER_STEMS.discard(base_name)
+
+# 允许根路径前缀树：按路径段下潜，挂载点多时替代逐根 startswith；
+# 根列表变化时懒重建（直接复用挂载点内存缓存）
+_ALLOWED_ROOT_TRIE = None
+_ALLOWED_ROOT_SRC = None
+_ALLOWED_ROOT_LOCK = threading.Lock()
+_TRIE_END = '\0'
+
+def _is_in_allowed_roots(target_path):
+    """判断 target_path 是否位于音乐库或任一挂载目录之内（按路径段匹配）。"""
+    global _ALLOWED_ROOT_TRIE, _ALLOWED_ROOT_SRC
+    roots = (os.path.abspath(MUSIC_LIBRARY_PATH),) + tuple(os.path.abspath(p) for p in get_mount_points())
+    with _ALLOWED_ROOT_LOCK:
+        if roots != _ALLOWED_ROOT_SRC:
+            trie = {}
+            for root in roots:
+                node = trie
+                for part in root.split(os.sep):
+                    node = node.setdefault(part, {})
+                node[_TRIE_END] = True
+            _ALLOWED_ROOT_TRIE, _ALLOWED_ROOT_SRC = trie, roots
+        node = _ALLOWED_ROOT_TRIE
+    for part in os.path.abspath(target_path).split(os.sep):
+        if _TRIE_END in node:
+            return True
+        node = node.get(part)
+        if node is None:
+            return False
+    return _TRIE_END in node
 
 def check_cover_exists(file_path: str, base_name: str = None) -> bool:
     """检查封面是否存在，搜索所有可能的位置"""
     if not base_name:
         base_name = os.path.splitext(os.path.basename(file_path))[0]
+
+    # 0. 已登记的封面主名直接命中（语义上等价于下面 2-4 步的并集）
+    with _KNOWN_COVER_STEMS_LOCK:
+        if base_name in _KNOWN_COVER_STEMS:
+            return True
+
     base_path = os.path.splitext(file_path)[0]
-    
+
     # 1. 歌曲同目录下的同名 jpg
     if os.path.exists(base_path + ".jpg"):
         return True
-    
+
     # 2. 歌曲所在目录的 covers 子目录
     song_dir = os.path.dirname(file_path)
     if os.path.exists(os.path.join(song_dir, 'covers', f"{base_name}.jpg")):
+        _remember_cover_stem(base_name)
         return True
-    
+
     # 3. 所有挂载目录的 covers 子目录
-    try:
-        with get_db() as conn:
-            rows = conn.execute("SELECT path FROM mount_points").fetchall()
-            for r in rows:
-                if r['path'] and os.path.exists(os.path.join(r['path'], 'covers', f"{base_name}.jpg")):
-                    return True
-    except Exception:
-        pass
-    
+    for p in get_mount_points():
+        if os.path.exists(os.path.join(p, 'covers', f"{base_name}.jpg")):
+            _remember_cover_stem(base_name)
+            return True
+
     # 4. 默认音乐库目录的 covers 子目录
     if os.path.exists(os.path.join(MUSIC_LIBRARY_PATH, 'covers', f"{base_name}.jpg")):
+        _remember_cover_stem(base_name)
         return True
-    
+
     return False
 
+def _collect_file_row(file_path, try_extract_cover=False, cover_index=None):
+    """提取单个文件的元数据，返回 songs 表的行元组（不做任何数据库操作）。
+
+    cover_index 为遍历阶段预收集的 (cover_stems, jpg_bases)，传入时封面
+    检测退化为两次集合查找，不再逐文件发 stat。
+    """
+    if not os.path.exists(file_path): return None
+    # 严格限制只能索引音频文件
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext not in AUDIO_EXTS: return None
+
+    stat = os.stat(file_path)
+    sid = generate_song_id(file_path)
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+
+    if cover_index is not None:
+        cover_stems, jpg_bases = cover_index
+        has_cover = 1 if (base_name in cover_stems or os.path.splitext(file_path)[0] in jpg_bases) else 0
+    else:
+        # 使用统一的封面检测函数
+        has_cover = 1 if check_cover_exists(file_path, base_name) else 0
+
+    # 只有确实要提内嵌封面时才做完整 File() 解析（会把 APIC/picture
+    # 图片数据读进内存）；纯元数据路径让 get_metadata 走 easy 模式，
+    # 只取 title/artist/album，封面重的文件能省掉兆级别的读取
+    audio = None
+    if not has_cover and try_extract_cover:
+        audio = parse_audio_file(file_path)
+        if extract_embedded_cover(file_path, base_name, audio=audio):
+            has_cover = 1
+    meta = get_metadata(file_path, audio=audio)
+
+    return (sid, file_path, os.path.basename(file_path), meta['title'], meta['artist'], meta['album'], stat.st_mtime, stat.st_size, has_cover)
+
+BULK_UPSERT_CHUNK = 500
+
+# 用 upsert 而不是 INSERT OR REPLACE：REPLACE 是删除+重插，会重写 B-tree
+# 叶节点并丢掉引用旧行的数据；DO UPDATE 原地更新，内容没变时直接跳过
+_UPSERT_SONG_SQL = '''
+    INSERT INTO songs (id, path, filename, title, artist, album, mtime, size, has_cover)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(path) DO UPDATE SET
+        id=excluded.id, filename=excluded.filename, title=excluded.title,
+        artist=excluded.artist, album=excluded.album, mtime=excluded.mtime,
+        size=excluded.size, has_cover=excluded.has_cover
+    WHERE songs.mtime IS NOT excluded.mtime OR songs.size IS NOT excluded.size
+       OR songs.has_cover IS NOT excluded.has_cover OR songs.title IS NOT excluded.title
+       OR songs.artist IS NOT excluded.artist OR songs.album IS NOT excluded.album
+'''
+
+# 扫描线程数：元数据提取是 I/O 密集型，默认 CPU*2，可用环境变量覆盖
+# (SCAN_MAX_WORKERS 与早期的 SCAN_PARALLELISM 等价，取先设置的那个)
+try:
+    SCAN_PARALLELISM = int(os.environ.get('SCAN_MAX_WORKERS') or os.environ.get('SCAN_PARALLELISM') or 0)
+except ValueError:
+    SCAN_PARALLELISM = 0
+if SCAN_PARALLELISM <= 0:
+    SCAN_PARALLELISM = min(32, (os.cpu_count() or 4) * 2)
+
+def _all_roots_slow(roots, threshold=0.05):
+    """粗测各根目录的 stat 延迟，判断是否全部位于慢速（网络）挂载上。
+
+    NFS/CIFS 上并发线程数超过几个后吞吐就被共享链路封顶，继续加线程
+    只会互相抢队列，此时把元数据线程池压小反而更快。
+    """
+    if not roots:
+        return False
+    for r in roots:
+        try:
+            t0 = time.monotonic()
+            os.stat(r)
+            if time.monotonic() - t0 <= threshold:
+                return False
+        except OSError:
+            continue
+    return True
+
+def bulk_upsert_songs(rows):
+    """分批写入歌曲行，单事务内 executemany，摊薄解析和 fsync 开销。"""
+    if not rows:
+        return
+    conn = get_db()
+    for i in range(0, len(rows), BULK_UPSERT_CHUNK):
+        batch = rows[i:i + BULK_UPSERT_CHUNK]
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(_UPSERT_SONG_SQL, batch)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        for r in batch:
+            _song_index_add(r[2], r[1], r[7])
+
+def bulk_delete_songs(paths):
+    """单事务批量删除歌曲记录。"""
+    if not paths:
+        return
+    conn = get_db()
+    # BEGIN IMMEDIATE: 提前拿写锁，整批删除只付一次提交开销
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany("DELETE FROM songs WHERE path=?", [(p,) for p in paths])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for p in paths:
+        _song_index_discard(p)
+
 def index_single_file(file_path):
     """单独索引一个文件。"""
     try:
-        if not os.path.exists(file_path): return
-        # 严格限制只能索引音频文件
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext not in AUDIO_EXTS: return
-        
-        stat = os.stat(file_path)
-        meta = get_metadata(file_path)
-        sid = generate_song_id(file_path)
-        base_name = os.path.splitext(os.path.basename(file_path))[0]
-        
-        # 使用统一的封面检测函数
-        has_cover = 1 if check_cover_exists(file_path, base_name) else 0
-        if not has_cover:
-            # 尝试提取内嵌封面
-            if extract_embedded_cover(file_path, base_name):
-                has_cover = 1
-        
+        row = _collect_file_row(file_path, try_extract_cover=True)
+        if not row: return
+
         with get_db() as conn:
             # 全局去重检测
-            dup = conn.execute("SELECT path FROM songs WHERE filename=? AND size=? AND path!=?", (os.path.basename(file_path), stat.st_size, file_path)).fetchone()
+            dup = conn.execute("SELECT path FROM songs WHERE filename=? AND size=? AND path!=?", (row[2], row[7], file_path)).fetchone()
             if dup:
                 logger.info(f"索引: 跳过重复文件 {file_path} (已存在: {dup['path']})")
                 return
 
-            conn.execute('''
-                INSERT OR REPLACE INTO songs (id, path, filename, title, artist, album, mtime, size, has_cover)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (sid, file_path, os.path.basename(file_path), meta['title'], meta['artist'], meta['album'], stat.st_mtime, stat.st_size, has_cover))
+            conn.execute(_UPSERT_SONG_SQL, row)
             conn.commit()
+        _song_index_add(row[2], row[1], row[7])
         logger.info(f"单文件索引完成: {file_path}")
     except Exception as e:
         logger.error(f"单文件索引失败: {e}")
 
+# 下载完成的文件先进队列，由单独线程攒批后在一个事务里建索引：
+# 歌单批量下载时整批只付一次 commit/fsync，而不是每首歌一次
+PENDING_INDEX = queue.Queue()
+
+def index_files_batch(paths):
+    """把一批文件在同一个事务里建索引。"""
+    rows = []
+    for p in paths:
+        try:
+            row = _collect_file_row(p, try_extract_cover=True)
+            if row:
+                rows.append(row)
+        except Exception as e:
+            logger.error(f"采集文件信息失败: {p}, 错误: {e}")
+    if not rows:
+        return
+    kept = []
+    try:
+        with get_db() as conn:
+            conn.execute("BEGIN")
+            for row in rows:
+                # 全局去重检测（与单文件索引一致）
+                dup = conn.execute(
+                    "SELECT path FROM songs WHERE filename=? AND size=? AND path!=?",
+                    (row[2], row[7], row[1])).fetchone()
+                if dup:
+                    logger.info(f"索引: 跳过重复文件 {row[1]} (已存在: {dup['path']})")
+                    continue
+                conn.execute(_UPSERT_SONG_SQL, row)
+                kept.append(row)
+            conn.commit()
+        for row in kept:
+            _song_index_add(row[2], row[1], row[7])
+        logger.info(f"批量索引完成: {len(kept)}/{len(paths)} 个文件")
+    except Exception as e:
+        logger.error(f"批量索引失败: {e}")
+
+def _index_drain_worker():
+    """索引聚合线程：等到第一个文件后开 2 秒窗口攒批，再一次性入库。"""
+    while True:
+        try:
+            batch = [PENDING_INDEX.get()]
+            time.sleep(2.0)
+            while True:
+                try:
+                    batch.append(PENDING_INDEX.get_nowait())
+                except queue.Empty:
+                    break
+            index_files_batch(batch)
+        except Exception as e:
+            logger.error(f"索引聚合线程异常: {e}")
+
+threading.Thread(target=_index_drain_worker, daemon=True).start()
+
 # --- 优化后的并发扫描逻辑 ---
+def _collect_cover_stems(covers_dir, cover_stems):
+    """枚举一个 covers 目录，把所有 .jpg 的主名记入集合。"""
+    try:
+        with os.scandir(covers_dir) as it:
+            for entry in it:
+                if entry.name.lower().endswith('.jpg'):
+                    cover_stems.add(os.path.splitext(entry.name)[0])
+    except OSError:
+        pass
+
+def _iter_audio_files(root_dir, cover_stems=None, jpg_bases=None):
+    """用 os.scandir 递归遍历音频文件。
+
+    DirEntry.stat() 直接复用目录项里缓存的元数据，避免 os.walk + os.stat
+    的二次系统调用；未变更文件由上层按 (mtime, size) 直接跳过。
+
+    传入 cover_stems / jpg_bases 集合时，顺路收集 covers 目录下的封面主名
+    和音频同目录的 .jpg (去掉扩展名的完整路径)，供封面检测直接查表。
+    """
+    stack = [root_dir]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            # 排除自动生成的目录，covers 只收集不深入
+                            if entry.name == 'covers':
+                                if cover_stems is not None:
+                                    _collect_cover_stems(entry.path, cover_stems)
+                            elif entry.name not in ('lyrics', '.trash'):
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            sep_ext = entry.name.rpartition('.')
+                            ext = sep_ext[2].lower() if sep_ext[1] else ''
+                            if ext in _AUDIO_EXT_BARE:
+                                stat = entry.stat()
+                                yield {'mtime': stat.st_mtime, 'size': stat.st_size, 'path': entry.path, 'filename': entry.name}
+                            elif ext == 'jpg' and jpg_bases is not None:
+                                jpg_bases.add(os.path.splitext(entry.path)[0])
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
 def scan_library_incremental():
     global SCAN_STATUS
     
@@ -1033,116 +1778,145 @@ def scan_library_incremental():
         
         # 1. 获取所有扫描根目录
         scan_roots = [MUSIC_LIBRARY_PATH]
-        try:
-            with get_db() as conn:
-                rows = conn.execute("SELECT path FROM mount_points").fetchall()
-                scan_roots.extend([r['path'] for r in rows])
-        except Exception: pass
-        
-        disk_files = {} # path -> info
-        supported_exts = AUDIO_EXTS
+        scan_roots.extend(get_mount_points(refresh=True))
         
-        # 2. 遍历所有目录
-        for root_dir in scan_roots:
-            if not os.path.exists(root_dir): continue
-            for root, dirs, files in os.walk(root_dir):
-                # 排除自动生成的目录
-                dirs[:] = [d for d in dirs if d not in ('lyrics', 'covers')]
-                for f in files:
-                    if f.lower().endswith(supported_exts):
-                        path = os.path.join(root, f)
-                        try:
-                            stat = os.stat(path)
-                            info = {'mtime': stat.st_mtime, 'size': stat.st_size, 'path': path, 'filename': f}
-                            disk_files[path] = info
-                        except: pass
-
+        # 2. 先取数据库快照，遍历时就地 diff：
+        # 未变更文件只付一次 DirEntry.stat，不再攒中间字典再过第二遍
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT id, path, mtime, size FROM songs")
-            db_rows = {row['path']: row for row in cursor.fetchall()}
-            
+            # 全表快照只按位置取列，用原生元组省掉 Row 的按名索引
+            cursor.row_factory = None
+            cursor.execute("SELECT path, mtime, size FROM songs")
+            db_rows = {row[0]: row for row in cursor.fetchall()}
+
+            # 3. 遍历所有目录，与数据库快照比对
+            # 多个根目录并发枚举：慢盘/NFS 挂载点的目录枚举本身就是瓶颈，
+            # 互相重叠 I/O 等待 (db_rows 只读，线程间共享安全)
+            # 遍历时顺路收集封面信息，元数据工作线程不再逐文件探测封面
+            cover_stems = set()
+            jpg_bases = set()
+
+            def _scan_root(root_dir):
+                paths = set()
+                to_process = []
+                for info in _iter_audio_files(root_dir, cover_stems=cover_stems, jpg_bases=jpg_bases):
+                    path = info['path']
+                    paths.add(path)
+                    db_rec = db_rows.get(path)
+                    if not db_rec or db_rec[1] != info['mtime'] or db_rec[2] != info['size']:
+                        to_process.append(info)
+                return paths, to_process
+
+            disk_paths = set()
+            files_to_process_list = []
+            existing_roots = [r for r in scan_roots if r and os.path.exists(r)]
+            if len(existing_roots) > 1:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=len(existing_roots)) as executor:
+                    for paths, to_process in executor.map(_scan_root, existing_roots):
+                        disk_paths.update(paths)
+                        files_to_process_list.extend(to_process)
+            elif existing_roots:
+                disk_paths, files_to_process_list = _scan_root(existing_roots[0])
+
             # 删除不存在的文件
             # 注意：如果某个挂载点被临时拔出，这里会删除其歌曲。
             # 简单起见：全量比对，消失即删除。
-            to_delete_paths = set(db_rows.keys()) - set(disk_files.keys())
-            if to_delete_paths:
-                cursor.executemany("DELETE FROM songs WHERE path=?", [(p,) for p in to_delete_paths])
-                conn.commit()
-
-            # 筛选需要更新的文件
-            files_to_process_list = []
-            for path, info in disk_files.items():
-                db_rec = db_rows.get(path)
-                if not db_rec or db_rec['mtime'] != info['mtime'] or db_rec['size'] != info['size']:
-                    files_to_process_list.append(info)
+            to_delete_paths = set(db_rows.keys()) - disk_paths
+            if len(to_delete_paths) > 1000:
+                # 大批量消失 (如挂载点拔出)：临时表 join，
+                # 一条 DELETE 替代逐路径的 B-tree 下潜
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS _alive(path TEXT PRIMARY KEY)")
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute("DELETE FROM _alive")
+                    conn.executemany("INSERT OR IGNORE INTO _alive VALUES(?)", [(p,) for p in disk_paths])
+                    conn.execute("DELETE FROM songs WHERE path NOT IN (SELECT path FROM _alive)")
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                conn.execute("DROP TABLE IF EXISTS _alive")
+            elif to_delete_paths:
+                bulk_delete_songs(to_delete_paths)
+
+            # 遍历刚枚举过所有 covers 目录，拿它整体替换常驻集合
+            # （不能只并入：盘上被手动删掉的封面要随全量扫描逐出，
+            # 否则 check_cover_exists 会一直拿到过期的 True）
+            with _KNOWN_COVER_STEMS_LOCK:
+                _KNOWN_COVER_STEMS.clear()
+                _KNOWN_COVER_STEMS.update(cover_stems)
 
             # 更新状态
             total_files = len(files_to_process_list)
             SCAN_STATUS.update({'total': total_files, 'processed': 0})
             
             to_update_db = []
-            
+
             # 3. 多线程处理
             if total_files > 0:
+                scan_workers = SCAN_PARALLELISM
+                if _all_roots_slow(existing_roots):
+                    scan_workers = min(scan_workers, 4)
+                    logger.info("检测到慢速挂载，元数据线程数压至 %d" % scan_workers)
                 logger.info(f"使用线程池处理 {total_files} 个文件...")
-                
-                def process_file_metadata(info):
-                    meta = get_metadata(info['path'])
-                    sid = generate_song_id(info['path'])
-                    base_name = os.path.splitext(info['filename'])[0]
-                    # 使用统一的封面检测函数
-                    has_cover = 1 if check_cover_exists(info['path'], base_name) else 0
-                    return (sid, info['path'], info['filename'], meta['title'], meta['artist'], meta['album'], info['mtime'], info['size'], has_cover)
-
-                with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-                    futures = {executor.submit(process_file_metadata, item): item for item in files_to_process_list}
+
+                cover_index = (cover_stems, jpg_bases)
+                # 进度用局部计数器攒批发布：每 200 个或 0.5 秒写一次
+                # SCAN_STATUS，避免每个文件都做字典写 + 百分比字符串拼接
+                processed = 0
+                last_pub = time.monotonic()
+                with concurrent.futures.ThreadPoolExecutor(max_workers=scan_workers) as executor:
+                    futures = {executor.submit(_collect_file_row, item['path'], cover_index=cover_index): item for item in files_to_process_list}
                     for future in concurrent.futures.as_completed(futures):
                         try:
                             res = future.result()
-                            to_update_db.append(res)
+                            if res:
+                                to_update_db.append(res)
                         except Exception: pass
-                        
-                        SCAN_STATUS['processed'] += 1
-                        if SCAN_STATUS['processed'] % 10 == 0:
-                            SCAN_STATUS['current_file'] = f"处理中... {int((SCAN_STATUS['processed']/total_files)*100)}%"
+
+                        processed += 1
+                        now = time.monotonic()
+                        if processed % 200 == 0 or now - last_pub > 0.5:
+                            SCAN_STATUS['processed'] = processed
+                            SCAN_STATUS['current_file'] = f"处理中... {processed * 100 // total_files}%"
+                            last_pub = now
+                SCAN_STATUS['processed'] = processed
 
                 # 过滤重复文件 (批次内去重 + 数据库去重)
+                # 数据库侧一次性取出 (filename, size) -> path 映射，
+                # 把 N 次 SELECT 往返换成 N 次哈希探查
+                existing_dup = {}
+                try:
+                    dup_cursor = conn.cursor()
+                    dup_cursor.row_factory = None
+                    for r in dup_cursor.execute("SELECT filename, size, path FROM songs"):
+                        existing_dup.setdefault((r[0], r[1]), r[2])
+                except Exception: pass
+
                 final_update_db = []
-                seen_in_batch = set() # (filename, size)
 
                 for item in to_update_db:
                     # structure: (sid, path, filename, title, artist, album, mtime, size, has_cover)
                     # item[1]=path, item[2]=filename, item[7]=size
-                    c_path, c_fname, c_size = item[1], item[2], item[7]
-                    
-                    # 1. 批次内查重
-                    if (c_fname, c_size) in seen_in_batch:
-                        logger.info(f"扫描: 跳过批次内重复文件 {c_path}")
+                    # setdefault 一次探查同时完成批次内与数据库去重：
+                    # 第一个占住 (filename, size) 的路径保留，其余跳过
+                    c_path = item[1]
+                    dup_path = existing_dup.setdefault((item[2], item[7]), c_path)
+                    if dup_path != c_path:
+                        logger.info(f"扫描: 跳过重复文件 {c_path} (已存在: {dup_path})")
                         continue
-                        
-                    # 2. 数据库查重 (排除自己)
-                    # 注意: 这里使用 conn (外层已开启)
-                    # 需要确保 conn 线程安全? sqlite3 单线程模式下需要注意。
-                    # 但 Flask 这里的 conn 是 thread-local 还是? 
-                    # scan_library_incremental 是后台任务，单线程执行 (executor 是处理 metadata 的)。
-                    # "with get_db() as conn" 在上层。所以是安全的。
-                    try:
-                        dup = conn.execute("SELECT path FROM songs WHERE filename=? AND size=? AND path!=?", (c_fname, c_size, c_path)).fetchone()
-                        if dup:
-                            logger.info(f"扫描: 跳过全局重复文件 {c_path} (已存在: {dup['path']})")
-                            continue
-                    except Exception: pass
-                    
-                    seen_in_batch.add((c_fname, c_size))
+
                     final_update_db.append(item)
 
-                if final_update_db:
-                    cursor.executemany('''
-                        INSERT OR REPLACE INTO songs (id, path, filename, title, artist, album, mtime, size, has_cover)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', final_update_db)
-                    conn.commit()
+            else:
+                final_update_db = []
+
+        # 批量写入在读取事务之外进行，分批单事务提交
+        if final_update_db:
+            bulk_upsert_songs(final_update_db)
+
+        # 扫描后按数据库全量重建内存歌曲索引，顺带清掉删除残留
+        _seed_song_index(rebuild=True)
 
         logger.info("扫描完成。")
         global LIBRARY_VERSION; LIBRARY_VERSION = time.time()
@@ -1156,7 +1930,7 @@ def scan_library_incremental():
             try: os.remove(lock_file)
             except: pass
 
-threading.Thread(target=lambda: (init_db(), scan_library_incremental()), daemon=True).start()
+threading.Thread(target=lambda: (init_db(), _seed_song_index(), scan_library_incremental()), daemon=True).start()
 threading.Thread(target=init_watchdog, daemon=True).start()
 
 # --- 路由定义 ---
@@ -1173,24 +1947,31 @@ def get_system_status():
     status['library_version'] = LIBRARY_VERSION
     return jsonify(status)
 
+# /api/music 响应缓存: 库没变时直接回放上次序列化好的字节
+_MUSIC_LIST_CACHE = (None, None)  # (library_version, payload_bytes)
+
 @app.route('/api/music', methods=['GET'])
 def get_music_list():
+    global _MUSIC_LIST_CACHE
     logger.info("API请求: 获取音乐列表")
+    # 以 LIBRARY_VERSION 作弱 ETag：客户端带 If-None-Match 且库没变时
+    # 直接 304，连缓存字节都不用回传
+    etag = f'W/"{LIBRARY_VERSION}"'
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers={'ETag': etag})
+    cached_ver, cached_payload = _MUSIC_LIST_CACHE
+    if cached_payload is not None and cached_ver == LIBRARY_VERSION:
+        return Response(cached_payload, mimetype='application/json', headers={'ETag': etag})
     try:
+        version_snapshot = LIBRARY_VERSION
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM songs ORDER BY title")
+            # 去重逻辑：标题+歌手+大小 完全一致视为重复文件，仅保留一个。
+            # GROUP BY 直接在 SQL 层去重，省掉 Python 侧的 seen 集合
+            cursor.execute("SELECT id, filename, title, artist, album, has_cover FROM songs GROUP BY title, artist, size ORDER BY title")
             songs = []
-            seen = set()
-            
+
             for row in cursor.fetchall():
-                # 去重逻辑：如果 标题+歌手+大小 完全一致，视为重复文件，仅保留第一个
-                # 这样可以解决不同目录下存放相同文件导致的列表重复问题
-                unique_key = (row['title'], row['artist'], row['size'])
-                if unique_key in seen:
-                    continue
-                seen.add(unique_key)
-                
                 album_art = None
                 if row['has_cover']:
                     base_name = os.path.splitext(row['filename'])[0]
@@ -1202,7 +1983,13 @@ def get_music_list():
                     'artist': row['artist'], 'album': row['album'], 'album_art': album_art
                 })
         logger.info(f"返回音乐数量: {len(songs)}")
-        return jsonify({'success': True, 'data': songs})
+        resp_obj = {'success': True, 'data': songs}
+        if orjson:
+            payload = orjson.dumps(resp_obj)
+        else:
+            payload = json.dumps(resp_obj, ensure_ascii=False).encode('utf-8')
+        _MUSIC_LIST_CACHE = (version_snapshot, payload)
+        return Response(payload, mimetype='application/json', headers={'ETag': f'W/"{version_snapshot}"'})
     except Exception as e:
         logger.exception(f"获取音乐列表失败: {e}")
         return jsonify({'success': False, 'error': str(e)})
@@ -1228,9 +2015,10 @@ def rescan_library():
     """强制重新扫描所有音乐目录，更新元数据"""
     logger.info("API请求: 重新扫描音乐库")
     try:
-        # 清空数据库中的歌曲记录，强制重新索引
+        # 把 mtime/size 归零让增量扫描判定所有文件"已修改"并重新提取元数据，
+        # 避免整表 DELETE 再重插：歌曲 ID 不变，库在扫描期间也不会短暂清空
         with get_db() as conn:
-            conn.execute("DELETE FROM songs")
+            conn.execute("UPDATE songs SET mtime = 0, size = 0")
             conn.commit()
         
         # 启动后台扫描
@@ -1280,7 +2068,8 @@ def add_mount_point():
             conn.execute("INSERT INTO mount_points (path, created_at) VALUES (?, ?)", (path, time.time()))
             conn.commit()
 
-        # 刷新监听并触发扫描
+        # 刷新缓存、监听并触发扫描
+        get_mount_points(refresh=True)
         refresh_watchdog_paths()
         threading.Thread(target=scan_library_incremental, daemon=True).start()
         
@@ -1298,7 +2087,8 @@ def remove_mount_point():
             conn.execute("DELETE FROM songs WHERE path LIKE ? || '%'", (path,))
             conn.execute("DELETE FROM mount_points WHERE path=?", (path,))
             conn.commit()
-            
+
+        get_mount_points(refresh=True)
         refresh_watchdog_paths()
         
         # 触发一次库版本更新
@@ -1315,47 +2105,97 @@ NETEASE_COOKIE = None
 NETEASE_MAX_CONCURRENT = 20
 LYRICS_DIR = os.path.join(MUSIC_LIBRARY_PATH, 'lyrics')
 
+# 网易云下载工作池：固定线程复用，免掉每个下载起新线程的开销；
+# 活跃数用锁保护的计数器维护，不再每次请求扫一遍 DOWNLOAD_TASKS
+DOWNLOAD_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=NETEASE_MAX_CONCURRENT, thread_name_prefix='ncm-dl')
+_DOWNLOAD_ACTIVE = 0
+_DOWNLOAD_ACTIVE_LOCK = threading.Lock()
+
+def _download_task_done(_fut):
+    global _DOWNLOAD_ACTIVE
+    with _DOWNLOAD_ACTIVE_LOCK:
+        _DOWNLOAD_ACTIVE -= 1
+
+def _submit_download(task_id, payload, queue=False):
+    """提交下载任务到工作池；并发已满时返回 False。
+
+    queue=True 时不拒绝而是照常入池排队（批量下载用），但仍计入
+    _DOWNLOAD_ACTIVE，让单曲接口的准入和 debug 指标看得到排队中的任务。"""
+    global _DOWNLOAD_ACTIVE
+    with _DOWNLOAD_ACTIVE_LOCK:
+        if not queue and _DOWNLOAD_ACTIVE >= NETEASE_MAX_CONCURRENT:
+            return False
+        _DOWNLOAD_ACTIVE += 1
+    fut = DOWNLOAD_EXECUTOR.submit(run_download_task, task_id, payload)
+    fut.add_done_callback(_download_task_done)
+    return True
+
+# 下载旁路线程池：封面/歌词等与音频字节无依赖的请求先行并发，
+# 与音频流下载重叠，把这几个 RTT 从关键路径上摘掉
+_DL_SIDE_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=8, thread_name_prefix='ncm-meta')
+
+def _download_tasks_janitor():
+    """唯一的任务清扫线程：每 60 秒清理结束超过 10 分钟的任务记录。
+
+    替代原先每个任务各起一个睡 600 秒的线程——持续下载时那会积累
+    成百上千个只为 pop 一个键的休眠线程。"""
+    while True:
+        time.sleep(60)
+        try:
+            cutoff = time.time() - 600
+            for k, v in list(DOWNLOAD_TASKS.items()):
+                if v.get('finished_at', float('inf')) < cutoff:
+                    DOWNLOAD_TASKS.pop(k, None)
+            # 批次记录保留 1 小时，够前端轮完进度
+            batch_cutoff = time.time() - 3600
+            for k, v in list(DOWNLOAD_BATCHES.items()):
+                if v.get('created_at', 0) < batch_cutoff:
+                    DOWNLOAD_BATCHES.pop(k, None)
+        except Exception:
+            pass
+
+threading.Thread(target=_download_tasks_janitor, daemon=True).start()
+
 os.makedirs(LYRICS_DIR, exist_ok=True)
 
+# 常见的 Set-Cookie 属性，不应出现在请求头 Cookie 中
+_COOKIE_ATTR_KEYS = frozenset(('path', 'expires', 'max-age', 'domain', 'samesite', 'secure', 'httponly'))
+
+def _cookie_items(raw: str):
+    """解析 cookie 字符串为 (key, value) 列表，剔除 Path/Expires 等属性。
+
+    优先走 SimpleCookie 的单遍正则解析；它遇到非法键会"静默丢弃"后面
+    所有项而不是抛异常，所以按段数核对，对不上就退回逐段 split 兜底。
+    """
+    raw = raw.replace('\n', ';')
+    pairs = [p for p in raw.split(';') if '=' in p]
+    try:
+        c = SimpleCookie()
+        c.load(raw)
+        if len(c) == len(pairs):
+            return [(k, m.value) for k, m in c.items() if k.lower() not in _COOKIE_ATTR_KEYS]
+    except Exception:
+        pass
+    items = []
+    for part in pairs:
+        k, v = part.strip().split('=', 1)
+        if k.lower() not in _COOKIE_ATTR_KEYS:
+            items.append((k, v))
+    return items
+
 def parse_cookie_string(cookie_str: str):
     """将 Set-Cookie 字符串解析为 requests 兼容的字典。"""
-    if not cookie_str: 
+    if not cookie_str:
         return {}
-    cookies = {}
-    # 只取 key=value 形式，忽略 Path/Expires 等属性
-    for part in cookie_str.split(';'):
-        if '=' in part:
-            k, v = part.strip().split('=', 1)
-            if k.lower() in ('path', 'expires', 'max-age', 'domain', 'samesite', 'secure'): 
-                continue
-            cookies[k] = v
-    return cookies
+    return dict(_cookie_items(cookie_str))
 
 def normalize_cookie_string(raw: str) -> str:
     """规范化 cookie 字符串，移除换行并过滤非关键属性。"""
-    if not raw: 
+    if not raw:
         return ''
-    parts = []
-    # 常见的 Set-Cookie 属性，不应出现在请求头 Cookie 中
-    skip_keys = ('path', 'expires', 'max-age', 'domain', 'samesite', 'secure', 'httponly')
-    
-    for part in raw.replace('\n', ';').split(';'):
-        part = part.strip()
-        if not part: continue
-        
-        # 忽略没有等号的属性 (如 Secure, HttpOnly)
-        if '=' not in part: 
-            # 但有些 cookie 值可能就是没有等号？不太可能，标准cookie都是 k=v
-            # 如果是 Secure/HttpOnly 这种flag，肯定要忽略
-            continue
-            
-        k, v = part.split('=', 1)
-        if k.strip().lower() in skip_keys:
-            continue
-            
-        parts.append(part)
-        
-    return '; '.join(parts)
+    return '; '.join(f'{k}={v}' for k, v in _cookie_items(raw))
 
 def load_netease_cookie():
     global NETEASE_COOKIE
@@ -1416,16 +2256,44 @@ def save_netease_config(download_dir: str = None, api_base: str = None): # Remov
     except Exception as e:
         logger.warning(f"保存网易云配置失败: {e}")
 
+# 热路径正则统一在模块级编译一次
+_SANITIZE_RE = re.compile(r'[\\/:*?"<>|]+')
+_URL_RE = re.compile(r'^https?://', re.I)
+_SONG_PL_PATH_RE = re.compile(r'/(song|playlist)/(\d+)')
+_FRAG_RE = re.compile(r'(song|playlist)[^0-9]*(\d+)')
+_ID_RE = re.compile(r'id=(\d+)')
+_TEXT_RE = re.compile(r'(playlist|song)[^0-9]*(\d+)', re.I)
+_DIGITS_RE = re.compile(r'(\d{5,})')
+_HOST_RE = re.compile(r'^https?://[^/]+')
+
 def sanitize_filename(name: str) -> str:
     """移除非法字符，避免文件名错误。"""
-    cleaned = re.sub(r'[\\/:*?"<>|]+', '_', name).strip().strip('.')
+    cleaned = _SANITIZE_RE.sub('_', name).strip().strip('.')
     return cleaned or 'netease_song'
 
+# 网易云 API 结果缓存：歌曲详情/歌词这类内容稳定的只读接口，
+# 同一首歌重复下载或重试时不再重发相同请求。
+# /song/url/v1 的直链带签名会过期，绝不能进缓存。
+_NETEASE_API_CACHE = OrderedDict()  # (path, params元组) -> (时间戳, 响应)
+_NETEASE_API_CACHE_LOCK = threading.Lock()
+_NETEASE_API_CACHE_MAX = 2048
+_NETEASE_API_CACHE_TTL = 3600.0
+_NETEASE_CACHEABLE_PATHS = frozenset(('/song/detail', '/lyric', '/lyric/new'))
+
 def call_netease_api(path: str, params: dict, method: str = 'GET', need_cookie: bool = True):
     """调用本地网易云 API，统一处理错误。"""
+    cache_key = None
+    if method.upper() == 'GET' and path in _NETEASE_CACHEABLE_PATHS:
+        cache_key = (path, tuple(sorted((params or {}).items())))
+        with _NETEASE_API_CACHE_LOCK:
+            hit = _NETEASE_API_CACHE.get(cache_key)
+            if hit and time.monotonic() - hit[0] < _NETEASE_API_CACHE_TTL:
+                _NETEASE_API_CACHE.move_to_end(cache_key)
+                return hit[1]
     base = (NETEASE_API_BASE or NETEASE_API_BASE_DEFAULT).rstrip('/')
     url = f"{base}{path}"
-    headers = dict(COMMON_HEADERS)
+    # 通用请求头已挂在 Session 上，这里只补 Cookie
+    headers = {}
     params = dict(params or {})
     cookies = {}
     if need_cookie and NETEASE_COOKIE:
@@ -1435,11 +2303,18 @@ def call_netease_api(path: str, params: dict, method: str = 'GET', need_cookie:
         params.setdefault('cookie', NETEASE_COOKIE)
         cookies = parse_cookie_string(NETEASE_COOKIE)
     if method.upper() == 'POST':
-        resp = requests.post(url, data=params, timeout=10, headers=headers, cookies=cookies)
+        resp = _NETEASE_SESSION.post(url, data=params, timeout=10, headers=headers, cookies=cookies)
     else:
-        resp = requests.get(url, params=params, timeout=10, headers=headers, cookies=cookies)
+        resp = _NETEASE_SESSION.get(url, params=params, timeout=10, headers=headers, cookies=cookies)
     resp.raise_for_status()
-    return resp.json()
+    result = resp.json()
+    if cache_key is not None and isinstance(result, dict):
+        with _NETEASE_API_CACHE_LOCK:
+            _NETEASE_API_CACHE[cache_key] = (time.monotonic(), result)
+            _NETEASE_API_CACHE.move_to_end(cache_key)
+            while len(_NETEASE_API_CACHE) > _NETEASE_API_CACHE_MAX:
+                _NETEASE_API_CACHE.popitem(last=False)
+    return result
 
 def _extract_song_level(privilege: dict):
     """返回(用户可下载的最高音质, 曲目最高音质)。"""
@@ -1537,10 +2412,10 @@ def _resolve_netease_input(raw: str, prefer: str = None):
     if candidate.startswith(('music.163.com', 'y.music.163.com', '163cn.tv')):
         candidate = f"https://{candidate}"
     # 跟随短链跳转获取真实地址，兼容 163cn.tv
-    if re.match(r'^https?://', candidate, re.I):
+    if _URL_RE.match(candidate):
         def _follow(url):
             try:
-                resp = requests.get(url, allow_redirects=True, timeout=8, headers=COMMON_HEADERS)
+                resp = _NETEASE_SESSION.get(url, allow_redirects=True, timeout=8)
                 return resp.url or url
             except Exception as e:
                 logger.warning(f"网易云链接解析失败: {e}")
@@ -1550,7 +2425,7 @@ def _resolve_netease_input(raw: str, prefer: str = None):
         # 针对 163cn.tv 短链再尝试一次 HEAD，避免部分环境 GET 被拦截
         if not followed and '163cn.tv' in candidate:
             try:
-                resp = requests.head(candidate, allow_redirects=True, timeout=6, headers=COMMON_HEADERS)
+                resp = _NETEASE_SESSION.head(candidate, allow_redirects=True, timeout=6)
                 followed = resp.url or resp.headers.get('Location')
             except Exception as e:
                 logger.warning(f"网易云短链 HEAD 解析失败: {e}")
@@ -1584,14 +2459,14 @@ def _resolve_netease_input(raw: str, prefer: str = None):
             if 'song' in seg:
                 route_hint = 'song'
         if not rid:
-            m = re.search(r'/(song|playlist)/(\d+)', path)
+            m = _SONG_PL_PATH_RE.search(path)
             if not m and frag_path:
-                m = re.search(r'(song|playlist)[^0-9]*(\d+)', frag_path)
+                m = _FRAG_RE.search(frag_path)
             if m:
                 route_hint = route_hint or m.group(1)
                 rid = m.group(2)
         if not rid:
-            m = re.search(r'id=(\d+)', url_str)
+            m = _ID_RE.search(url_str)
             if m:
                 rid = m.group(1)
         if rid:
@@ -1603,10 +2478,10 @@ def _resolve_netease_input(raw: str, prefer: str = None):
         return parsed
 
     # 回退：直接在文本中寻找
-    m = re.search(r'(playlist|song)[^0-9]*(\d+)', text, re.IGNORECASE)
+    m = _TEXT_RE.search(text)
     if m:
         return {'type': m.group(1).lower(), 'id': m.group(2)}
-    m = re.search(r'(\d{5,})', text)
+    m = _DIGITS_RE.search(text)
     if m:
         return {'type': prefer or 'song', 'id': m.group(1)}
     return None
@@ -1619,9 +2494,21 @@ def _fetch_playlist_songs(playlist_id: str):
     track_ids = [t.get('id') for t in playlist.get('trackIds', []) if t.get('id')]
     tracks = playlist.get('tracks') or []
     if not tracks and track_ids:
-        ids_str = ','.join(map(str, track_ids[:300]))  # protect from huge lists
-        song_detail = call_netease_api('/song/detail', {'ids': ids_str})
-        tracks = song_detail.get('songs', []) if isinstance(song_detail, dict) else []
+        # 按 200 个一批并发拉取详情，大歌单不再截断在 300 首；
+        # executor.map 保持歌单原始顺序，连接池复用同一批套接字
+        chunks = [track_ids[i:i + 200] for i in range(0, len(track_ids), 200)]
+
+        def _fetch_chunk(chunk):
+            resp = call_netease_api('/song/detail', {'ids': ','.join(map(str, chunk))})
+            return resp.get('songs', []) if isinstance(resp, dict) else []
+
+        if len(chunks) == 1:
+            tracks = _fetch_chunk(chunks[0])
+        else:
+            tracks = []
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(NETEASE_MAX_CONCURRENT, len(chunks))) as executor:
+                for got in executor.map(_fetch_chunk, chunks):
+                    tracks.extend(got)
     songs = _format_netease_songs(tracks)
     return songs, playlist.get('name')
 
@@ -1637,6 +2524,33 @@ def _fetch_song_detail(song_id: str):
 load_netease_config()
 load_netease_cookie()
 
+# 目录清单缓存: 歌词/封面查找要对 4-6 个候选路径逐个 stat，且未命中
+# 占绝大多数。改为按短 TTL 缓存整个目录的清单，存在性判断退化为一次
+# 集合查找；写入新文件的代码负责让对应目录失效
+_DIR_INDEX_CACHE = {}
+_DIR_INDEX_LOCK = threading.Lock()
+_DIR_INDEX_TTL = 5.0
+
+def _dir_has(dirpath, name):
+    """判断 dirpath 目录下是否存在名为 name 的条目（目录清单缓存）。"""
+    now = time.monotonic()
+    with _DIR_INDEX_LOCK:
+        cached = _DIR_INDEX_CACHE.get(dirpath)
+        if cached and now - cached[0] < _DIR_INDEX_TTL:
+            return name in cached[1]
+    try:
+        with os.scandir(dirpath) as it:
+            names = frozenset(e.name for e in it)
+    except OSError:
+        names = frozenset()
+    with _DIR_INDEX_LOCK:
+        _DIR_INDEX_CACHE[dirpath] = (now, names)
+    return name in names
+
+def _dir_index_invalidate(dirpath):
+    with _DIR_INDEX_LOCK:
+        _DIR_INDEX_CACHE.pop(dirpath, None)
+
 @app.route('/api/music/lyrics')
 def get_lyrics_api():
     logger.info("API请求: 获取歌词")
@@ -1654,21 +2568,25 @@ def get_lyrics_api():
         if os.path.isabs(filename) and os.path.exists(filename):
             actual_path = filename
         else:
-            try:
-                with get_db() as conn:
-                    # Try to find path by filename in DB
-                    row = conn.execute("SELECT path FROM songs WHERE filename=?", (os.path.basename(filename),)).fetchone()
-                    if row and os.path.exists(row['path']):
-                        actual_path = row['path']
-            except Exception as e:
-                logger.warning(f"查询歌曲路径失败: {e}")
+            # 内存歌曲索引替代按文件名的单行 SELECT
+            cand = _resolve_song_path(os.path.basename(filename))
+            if cand and os.path.exists(cand):
+                actual_path = cand
 
-    # 1. 优先读取本地 .lrc 文件
-    lrc_path = None
+    # 路径派生量只算一次，搜索/内嵌保存/网络保存共用
+    local_dir = base_name = save_lrc_path = None
     if actual_path:
         local_dir = os.path.dirname(actual_path)
         base_name = os.path.splitext(os.path.basename(actual_path))[0]
-        
+        save_lrc_path = os.path.join(local_dir, 'lyrics', f"{base_name}.lrc")
+    elif filename:
+        # 没有实际路径时保存到默认目录
+        save_lrc_path = os.path.join(get_default_download_dir(), 'lyrics',
+                                     f"{os.path.splitext(os.path.basename(filename))[0]}.lrc")
+
+    # 1. 优先读取本地 .lrc 文件
+    lrc_path = None
+    if actual_path:
         # 构建搜索路径列表
         search_paths = []
         
@@ -1678,26 +2596,25 @@ def get_lyrics_api():
         # 1.2 歌曲所在目录的 lyrics 子目录
         search_paths.append(os.path.join(local_dir, 'lyrics', f"{base_name}.lrc"))
         
-        # 1.3 所有挂载目录的 lyrics 子目录
-        try:
-            with get_db() as conn:
-                rows = conn.execute("SELECT path FROM mount_points").fetchall()
-                for r in rows:
-                    if r['path']:
-                        search_paths.append(os.path.join(r['path'], 'lyrics', f"{base_name}.lrc"))
-        except Exception:
-            pass
+        # 1.3 所有挂载目录的 lyrics 子目录（内存缓存，不走数据库）
+        for p in get_mount_points():
+            search_paths.append(os.path.join(p, 'lyrics', f"{base_name}.lrc"))
         
         # 1.4 默认音乐库目录的 lyrics 子目录
         search_paths.append(os.path.join(MUSIC_LIBRARY_PATH, 'lyrics', f"{base_name}.lrc"))
         
-        # 查找第一个存在的歌词文件
+        # 查找第一个存在的歌词文件（目录清单缓存替代逐个 stat）
         for path in search_paths:
-            if os.path.exists(path):
+            if _dir_has(os.path.dirname(path), os.path.basename(path)):
                 lrc_path = path
                 break
 
     if lrc_path and os.path.exists(lrc_path):
+        # raw=1 直接把文件流出去：大 .lrc 不用整读进内存再付一遍
+        # JSON 转义，send_file 还自带 ETag/条件请求处理
+        if request.args.get('raw') == '1':
+            logger.info(f"本地歌词命中(raw): {lrc_path}")
+            return send_file(lrc_path, mimetype='text/plain; charset=utf-8', conditional=True)
         try:
             with open(lrc_path, 'r', encoding='utf-8') as f:
                 logger.info(f"本地歌词命中: {lrc_path}")
@@ -1707,61 +2624,99 @@ def get_lyrics_api():
 
     # 2. 尝试提取内嵌歌词
     if actual_path:
-        embedded_lrc = extract_embedded_lyrics(actual_path)
+        try:
+            st = os.stat(actual_path)
+            embedded_lrc = _embedded_lyrics_cached(actual_path, st.st_mtime_ns, st.st_size)
+        except OSError:
+            embedded_lrc = None
         if embedded_lrc:
             # Save to cache if possible - 保存到歌曲所在目录
             try:
-                local_dir = os.path.dirname(actual_path)
-                save_dir = os.path.join(local_dir, 'lyrics')
+                save_dir = os.path.dirname(save_lrc_path)
                 os.makedirs(save_dir, exist_ok=True)
-                base_name = os.path.splitext(os.path.basename(actual_path))[0]
-                save_path = os.path.join(save_dir, f"{base_name}.lrc")
-                with open(save_path, 'w', encoding='utf-8') as f:
+                with open(save_lrc_path, 'w', encoding='utf-8') as f:
                     f.write(embedded_lrc)
-                logger.info(f"内嵌歌词提取并保存: {save_path}")
+                _dir_index_invalidate(save_dir)
+                logger.info(f"内嵌歌词提取并保存: {save_lrc_path}")
             except Exception as e:
                 logger.warning(f"保存内嵌歌词失败: {e}")
             return jsonify({'success': True, 'lyrics': embedded_lrc})
 
-    # 3. 网络获取
+    # 3. 网络获取：挪到后台线程执行，请求不再陪外网等满超时
+    neg_key = (artist or '', title)
+    if _neg_cache_hit(_NEG_LYRICS, neg_key):
+        logger.info(f"歌词负缓存命中: {title} - {artist}")
+        return jsonify({'success': False})
+
+    fut = _submit_fetch('lyrics', artist, title,
+                        lambda: _fetch_lyrics_from_net(artist, title, save_lrc_path))
+    # 必须同步拿结果的客户端可带 ?wait=1，最多等 3 秒
+    if request.args.get('wait') == '1':
+        try:
+            lyrics = fut.result(timeout=3)
+        except Exception:
+            lyrics = None
+        if lyrics:
+            return jsonify({'success': True, 'lyrics': lyrics})
+        return jsonify({'success': False, 'pending': not fut.done()})
+    return jsonify({'success': False, 'pending': True}), 202
+
+def _fetch_lyrics_from_net(artist, title, save_lrc_path):
+    """后台执行的网络歌词抓取，成功返回歌词文本并落盘，失败返回 None。"""
     api_urls = [
         f"https://api.lrc.cx/lyrics?artist={quote(artist or '')}&title={quote(title)}",
         f"https://lrcapi.msfxp.top/lyrics?artist={quote(artist or '')}&title={quote(title)}"
     ]
-    
-    # Determine save path for network lyrics - 保存到歌曲所在目录
-    save_lrc_path = None
-    if actual_path:
-        local_dir = os.path.dirname(actual_path)
-        base_name = os.path.splitext(os.path.basename(actual_path))[0]
-        save_lrc_path = os.path.join(local_dir, 'lyrics', f"{base_name}.lrc")
-    elif filename:
-        # 如果没有实际路径，保存到默认目录
-        lyrics_base_dir = get_default_download_dir()
-        save_lrc_path = os.path.join(lyrics_base_dir, 'lyrics', f"{os.path.splitext(os.path.basename(filename))[0]}.lrc")
 
-    for idx, api_url in enumerate(api_urls):
-        try:
-            label = "主API" if idx == 0 else "备用API"
-            safe_url = re.sub(r'^https?://[^/]+', f'[{label}]', api_url)
-            logger.info(f"请求网络歌词API: {safe_url}")
-            resp = requests.get(api_url, timeout=3, headers=COMMON_HEADERS)
-            if resp.status_code == 200:
-                if save_lrc_path:
-                    try:
-                        os.makedirs(os.path.dirname(save_lrc_path), exist_ok=True)
-                        with open(save_lrc_path, 'wb') as f:
-                            f.write(resp.text.encode('utf-8'))
-                        logger.info(f"网络歌词保存: {save_lrc_path}")
-                    except Exception as e:
-                        logger.warning(f"保存网络歌词失败: {e}")
-                return jsonify({'success': True, 'lyrics': resp.text})
-            else:
-                logger.warning(f"歌词API响应异常: {api_url}, 状态码: {resp.status_code}")
-        except:
-            pass
+    # 本地已有缓存体时带上条件请求头，远端没变就拿 304 复用磁盘内容
+    cond_headers = None
+    if save_lrc_path and os.path.exists(save_lrc_path):
+        cond_headers = _load_http_meta(save_lrc_path)
+
+    resp = _race_first_ok(api_urls, lambda r: r.status_code in (200, 304), "歌词",
+                          headers=cond_headers)
+    if resp is not None:
+        if resp.status_code == 304:
+            try:
+                with open(save_lrc_path, 'r', encoding='utf-8') as f:
+                    return f.read()
+            except Exception as e:
+                logger.warning(f"304 复用本地歌词失败: {e}")
+                return None
+        if save_lrc_path:
+            try:
+                os.makedirs(os.path.dirname(save_lrc_path), exist_ok=True)
+                with open(save_lrc_path, 'wb') as f:
+                    f.write(resp.text.encode('utf-8'))
+                _save_http_meta(save_lrc_path, resp)
+                _dir_index_invalidate(os.path.dirname(save_lrc_path))
+                logger.info(f"网络歌词保存: {save_lrc_path}")
+            except Exception as e:
+                logger.warning(f"保存网络歌词失败: {e}")
+        return resp.text
+    _neg_cache_put(_NEG_LYRICS, (artist or '', title))
     logger.warning(f"歌词获取失败: {title} - {artist}")
-    return jsonify({'success': False})
+    return None
+
+@app.route('/api/music/lyrics/status')
+def get_fetch_status():
+    """查询后台歌词/封面抓取进度（kind=lyrics|cover，默认 lyrics）。"""
+    title = request.args.get('title')
+    if not title:
+        return jsonify({'success': False})
+    kind = request.args.get('kind', 'lyrics')
+    artist = request.args.get('artist') or ''
+    with _INFLIGHT_LOCK:
+        fut = _INFLIGHT.get((kind, artist, title))
+    if fut is None:
+        return jsonify({'success': False, 'state': 'unknown'})
+    if not fut.done():
+        return jsonify({'success': True, 'state': 'pending'})
+    try:
+        ok = bool(fut.result(timeout=0))
+    except Exception:
+        ok = False
+    return jsonify({'success': True, 'state': 'done' if ok else 'failed'})
 
 @app.route('/api/music/album-art')
 def get_album_art_api():
@@ -1778,93 +2733,193 @@ def get_album_art_api():
     if os.path.isabs(filename) and os.path.exists(filename):
         actual_path = filename
     else:
-        try:
-            with get_db() as conn:
-                row = conn.execute("SELECT path FROM songs WHERE filename=?", (os.path.basename(filename),)).fetchone()
-                if row and os.path.exists(row['path']):
-                    actual_path = row['path']
-        except Exception as e:
-            logger.warning(f"查询歌曲路径失败: {e}")
+        # 内存歌曲索引替代按文件名的单行 SELECT
+        cand = _resolve_song_path(os.path.basename(filename))
+        if cand and os.path.exists(cand):
+            actual_path = cand
     
+    # 歌曲所在目录只算一次，搜索/保存/内嵌提取共用
+    song_dir = os.path.dirname(actual_path) if actual_path else None
+
     # 构建搜索路径列表
     search_paths = []
-    
+
     # 1. 歌曲所在目录的 covers 子目录
-    if actual_path:
-        local_dir = os.path.dirname(actual_path)
-        search_paths.append(os.path.join(local_dir, 'covers', f"{base_name}.jpg"))
+    if song_dir:
+        search_paths.append(os.path.join(song_dir, 'covers', f"{base_name}.jpg"))
     
-    # 2. 所有挂载目录的 covers 子目录
-    try:
-        with get_db() as conn:
-            rows = conn.execute("SELECT path FROM mount_points").fetchall()
-            for r in rows:
-                if r['path']:
-                    search_paths.append(os.path.join(r['path'], 'covers', f"{base_name}.jpg"))
-    except Exception:
-        pass
+    # 2. 所有挂载目录的 covers 子目录（内存缓存，不走数据库）
+    for p in get_mount_points():
+        search_paths.append(os.path.join(p, 'covers', f"{base_name}.jpg"))
     
     # 3. 默认音乐库目录的 covers 子目录
     search_paths.append(os.path.join(MUSIC_LIBRARY_PATH, 'covers', f"{base_name}.jpg"))
     
-    # 查找第一个存在的封面文件
+    # 查找第一个存在的封面文件（目录清单缓存替代逐个 stat）
     for path in search_paths:
-        if os.path.exists(path):
+        if _dir_has(os.path.dirname(path), os.path.basename(path)):
             return jsonify({'success': True, 'album_art': f"/api/music/covers/{quote(base_name)}.jpg?filename={quote(filename)}"})
 
     # 确定封面保存目录（优先保存到歌曲所在目录）
-    if actual_path:
-        cover_save_dir = os.path.join(os.path.dirname(actual_path), 'covers')
+    if song_dir:
+        cover_save_dir = os.path.join(song_dir, 'covers')
     else:
         cover_save_dir = os.path.join(get_default_download_dir(), 'covers')
     local_path = os.path.join(cover_save_dir, f"{base_name}.jpg")
-    
+
     # 尝试从音频内嵌封面提取
-    if actual_path and extract_embedded_cover(actual_path, base_name, os.path.dirname(actual_path)):
+    if actual_path and extract_embedded_cover(actual_path, base_name, song_dir):
+        _mark_has_cover(filename)
+        return jsonify({'success': True, 'album_art': f"/api/music/covers/{quote(base_name)}.jpg?filename={quote(filename)}"})
+
+    # 网络获取并保存：挪到后台线程执行，请求不再陪外网等满超时
+    neg_key = (artist, title)
+    if _neg_cache_hit(_NEG_COVERS, neg_key):
+        logger.info(f"封面负缓存命中: {title} - {artist}")
+        return jsonify({'success': False})
+
+    album_art_url = f"/api/music/covers/{quote(base_name)}.jpg?filename={quote(filename)}"
+    fut = _submit_fetch('cover', artist, title,
+                        lambda: _fetch_cover_from_net(artist, title, base_name,
+                                                      filename, local_path, cover_save_dir))
+    # 必须同步拿结果的客户端可带 ?wait=1，最多等 3 秒
+    if request.args.get('wait') == '1':
         try:
-            if not os.path.isabs(filename):
-                with get_db() as conn:
-                    conn.execute("UPDATE songs SET has_cover=1 WHERE filename=?", (os.path.basename(filename),))
-                    conn.commit()
+            ok = fut.result(timeout=3)
         except Exception:
-            pass
-        return jsonify({'success': True, 'album_art': f"/api/music/covers/{quote(base_name)}.jpg?filename={quote(filename)}"})
+            ok = False
+        if ok:
+            return jsonify({'success': True, 'album_art': album_art_url})
+        return jsonify({'success': False, 'pending': not fut.done()})
+    return jsonify({'success': False, 'pending': True}), 202
+
+def _mark_has_cover(filename):
+    """封面生成成功后统一更新数据库标识（库内文件才有对应行）。"""
+    if os.path.isabs(filename):
+        return
+    try:
+        with get_db() as conn:
+            conn.execute("UPDATE songs SET has_cover=1 WHERE filename=?",
+                         (os.path.basename(filename),))
+            conn.commit()
+    except Exception:
+        pass
 
-    # 网络获取并保存
+def _fetch_cover_from_net(artist, title, base_name, filename, local_path, cover_save_dir):
+    """后台执行的网络封面抓取，成功落盘并更新数据库标识，返回是否成功。"""
     api_urls = [
         f"https://api.lrc.cx/cover?artist={quote(artist)}&title={quote(title)}",
         f"https://lrcapi.msfxp.top/cover?artist={quote(artist)}&title={quote(title)}"
     ]
-    
+
     # 确保封面目录存在
     os.makedirs(cover_save_dir, exist_ok=True)
-    
-    for idx, api_url in enumerate(api_urls):
+
+    # 本地已有缓存体时带上条件请求头，远端没变就拿 304 复用磁盘内容
+    cond_headers = None
+    if os.path.exists(local_path):
+        cond_headers = _load_http_meta(local_path)
+
+    resp = _race_first_ok(
+        api_urls,
+        lambda r: r.status_code == 304 or
+                  (r.status_code == 200 and r.headers.get('content-type', '').startswith('image/')),
+        "封面", headers=cond_headers)
+    if resp is not None and resp.status_code == 304:
+        _remember_cover_stem(base_name)
+        return True
+    if resp is not None:
         try:
-            label = "主API" if idx == 0 else "备用API"
-            safe_url = re.sub(r'^https?://[^/]+', f'[{label}]', api_url)
-            logger.info(f"请求网络封面API: {safe_url}")
-            resp = requests.get(api_url, timeout=3, headers=COMMON_HEADERS)
-            if resp.status_code == 200 and resp.headers.get('content-type', '').startswith('image/'):
-                with open(local_path, 'wb') as f: 
-                    f.write(resp.content)
-                logger.info(f"网络封面保存: {local_path}")
-                
-                # 更新数据库标识
-                if not os.path.isabs(filename):
-                    with get_db() as conn: 
-                        conn.execute("UPDATE songs SET has_cover=1 WHERE filename=?", (filename,))
-                        conn.commit()
-                        
-                return jsonify({'success': True, 'album_art': f"/api/music/covers/{quote(base_name)}.jpg?filename={quote(filename)}"})
-            else:
-                logger.warning(f"封面API响应异常: {api_url}, 状态码: {resp.status_code}")
-        except:
-            pass
+            with open(local_path, 'wb') as f:
+                f.write(resp.content)
+            _save_http_meta(local_path, resp)
+            _dir_index_invalidate(cover_save_dir)
+            _remember_cover_stem(base_name)
+            logger.info(f"网络封面保存: {local_path}")
+            _mark_has_cover(filename)
+            return True
+        except Exception as e:
+            logger.warning(f"保存网络封面失败: {e}")
+    if resp is None:
+        _neg_cache_put(_NEG_COVERS, (artist, title))
     logger.warning(f"封面获取失败: {title} - {artist}")
-    return jsonify({'success': False})
+    return False
+
+def _purge_siblings(target_path):
+    """清理歌曲的关联文件：同级 .lrc/.yrc/.jpg 与主库 covers/lyrics
+    下的同名缓存（含 ETag 边车）。
+
+    候选存在性统一走目录清单缓存 (_dir_has)，不再对每个候选路径单独
+    stat，只对确实存在的条目 unlink。
+    """
+    base = os.path.splitext(target_path)[0]
+    base_name = os.path.basename(base)
+    candidates = [base + ext for ext in ('.lrc', '.yrc', '.jpg')]
+    candidates.append(os.path.join(MUSIC_LIBRARY_PATH, 'covers', base_name + '.jpg'))
+    candidates.append(os.path.join(MUSIC_LIBRARY_PATH, 'lyrics', base_name + '.lrc'))
+    candidates.append(os.path.join(MUSIC_LIBRARY_PATH, 'lyrics', base_name + '.yrc'))
+
+    touched_dirs = set()
+    for path in candidates:
+        dirpath, name = os.path.split(path)
+        for target in (name, name + '.meta.json'):
+            if not _dir_has(dirpath, target):
+                continue
+            try:
+                os.remove(os.path.join(dirpath, target))
+                touched_dirs.add(dirpath)
+            except OSError:
+                pass
+    for dirpath in touched_dirs:
+        _dir_index_invalidate(dirpath)
+    _forget_cover_stem(base_name)
 
 @app.route('/api/music/delete/<song_id>', methods=['DELETE'])
+def _reap_trash_file(trash_path, attempts=20):
+    """后台删除回收目录里的文件，锁未释放时按指数退避重试。"""
+    delay = 0.2
+    for _ in range(attempts):
+        try:
+            os.remove(trash_path)
+            return
+        except PermissionError:
+            time.sleep(delay)
+            delay = min(delay * 2, 10)
+        except OSError:
+            return
+
+def _remove_with_retry(target_path):
+    """删除可能被占用的文件（应对 Windows 文件锁）。
+
+    直接删失败时先把文件改名进同目录的 .trash —— NTFS 上句柄未关
+    改名也能成功，真正的删除交给后台线程慢慢重试；改名也不行再退回
+    指数退避（10ms 起翻倍），锁一松就返回，不再固定睡满 0.2 秒。
+    """
+    try:
+        os.remove(target_path)
+        return True
+    except PermissionError:
+        pass
+    try:
+        trash_dir = os.path.join(os.path.dirname(target_path), '.trash')
+        os.makedirs(trash_dir, exist_ok=True)
+        trash_path = os.path.join(
+            trash_dir, f"{int(time.time() * 1e6)}{os.path.splitext(target_path)[1]}")
+        os.replace(target_path, trash_path)
+        threading.Thread(target=_reap_trash_file, args=(trash_path,), daemon=True).start()
+        return True
+    except OSError:
+        pass
+    delay = 0.01
+    for _ in range(8):
+        try:
+            os.remove(target_path)
+            return True
+        except PermissionError:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+    return False
+
 def delete_file(song_id):
     try:
         # 1. 查询路径
@@ -1884,39 +2939,15 @@ def delete_file(song_id):
         if ext.lower() not in ALLOWED_DELETE_EXTS:
              return jsonify({'success': False, 'error': f'为了安全，禁止删除 {ext} 类型的文件'})
 
-        # 重试机制应对 Windows 文件锁
-        for i in range(10):
-            try:
-                os.remove(target_path)
-                break
-            except PermissionError:
-                if i < 9: time.sleep(0.2)
-                else: return jsonify({'success': False, 'error': '文件正被占用，无法删除'})
-        
-        # 清理同级关联资源 (封面/歌词/逐字歌词)
-        base = os.path.splitext(target_path)[0]
-        for ext in ['.lrc', '.yrc', '.jpg']:
-            try:
-                if os.path.exists(base + ext): os.remove(base + ext)
-            except: pass
-            
-        # 尝试清理主库下的 covers/lyrics
-        filename = os.path.basename(target_path)
-        base_name = os.path.splitext(filename)[0]
-        
-        # 清理封面
-        try:
-             cv_path = os.path.join(MUSIC_LIBRARY_PATH, 'covers', base_name + '.jpg')
-             if os.path.exists(cv_path): os.remove(cv_path)
-        except: pass
+        # 应对 Windows 文件锁：先试改名进回收目录，失败再指数退避重试
+        if not _remove_with_retry(target_path):
+            return jsonify({'success': False, 'error': '文件正被占用，无法删除'})
+
+
+        # 清理关联资源 (同级封面/歌词 + 主库 covers/lyrics 缓存)
+        _purge_siblings(target_path)
+
 
-        # 清理歌词 (.lrc / .yrc)
-        for lext in ['.lrc', '.yrc']:
-            try:
-                ly_path = os.path.join(MUSIC_LIBRARY_PATH, 'lyrics', base_name + lext)
-                if os.path.exists(ly_path): os.remove(ly_path)
-            except: pass
-        
         # 4. 数据库清理 (Watchdog 也会做，但双重保障)
         with get_db() as conn:
             conn.execute("DELETE FROM songs WHERE path=?", (target_path,))
@@ -1937,12 +2968,13 @@ def clear_metadata(song_id=None):
     """
     try:
         target_path = None
-        
+        # 整个请求复用同一个连接：路径查询和最后的 UPDATE 不再各开一次
+        conn = get_db() if song_id else None
+
         # 模式1: ID模式
         if song_id:
-            with get_db() as conn:
-                row = conn.execute("SELECT path FROM songs WHERE id=?", (song_id,)).fetchone()
-                if row: target_path = row['path']
+            row = conn.execute("SELECT path FROM songs WHERE id=?", (song_id,)).fetchone()
+            if row: target_path = row['path']
         # 模式2: Path模式
         else:
             data = request.get_json() or {}
@@ -1953,14 +2985,7 @@ def clear_metadata(song_id=None):
 
         # 安全检查：确保路径在允许的范围内
         target_path = os.path.abspath(target_path)
-        allowed_roots = [os.path.abspath(MUSIC_LIBRARY_PATH)]
-        try:
-            with get_db() as conn:
-                rows = conn.execute("SELECT path FROM mount_points").fetchall()
-                allowed_roots.extend([os.path.abspath(r['path']) for r in rows])
-        except Exception: pass
-        
-        if not any(target_path.startswith(root) for root in allowed_roots):
+        if not _is_in_allowed_roots(target_path):
             return jsonify({'success': False, 'error': '非法路径：仅允许操作音乐库内的文件'})
 
         # 核心逻辑：清理主库下的 centralized covers/lyrics
@@ -1971,18 +2996,22 @@ def clear_metadata(song_id=None):
         for sub in ['lyrics', 'covers']:
             ext = '.lrc' if sub == 'lyrics' else '.jpg'
             sub_path = os.path.join(MUSIC_LIBRARY_PATH, sub, base_name + ext)
-            try: 
-                if os.path.exists(sub_path): 
+            try:
+                if os.path.exists(sub_path):
                     os.remove(sub_path)
                     deleted_count += 1
+                if os.path.exists(sub_path + '.meta.json'):
+                    os.remove(sub_path + '.meta.json')
+                if sub == 'covers':
+                    _forget_cover_stem(base_name)
             except: pass
 
         # 如果是库内文件（有song_id），还需要重置数据库状态
         if song_id:
-            with get_db() as conn:
-                conn.execute("UPDATE songs SET has_cover=0 WHERE id=?", (song_id,))
-                conn.commit()
-            
+            conn.execute("UPDATE songs SET has_cover=0 WHERE id=?", (song_id,))
+            conn.commit()
+
+
         logger.info(f"元数据已清除: {filename}, ID: {song_id}, 删除数: {deleted_count}")
         return jsonify({'success': True})
     except Exception as e: 
@@ -1992,32 +3021,35 @@ def clear_metadata(song_id=None):
 # --- 辅助接口 ---
 @app.route('/api/music/covers/<cover_name>')
 def get_cover(cover_name):
+    # 封面内容基本不变，开条件响应 + 一天的浏览器缓存：
+    # 重复加载命中 304 或本地缓存，不再每次从磁盘整读一遍
+    def _send_cover(path):
+        resp = send_file(path, mimetype='image/jpeg', conditional=True, max_age=86400)
+        resp.headers['Cache-Control'] = 'public, max-age=86400'
+        return resp
+
     cover_name = unquote(cover_name)
     filename = request.args.get('filename', '')
-    
+
+    # 0. 快路径：绝大多数封面都集中在主库 covers 目录，先查它，
+    # 命中就不用再构建整个搜索目录列表
+    fast = os.path.join(MUSIC_LIBRARY_PATH, 'covers', cover_name)
+    if os.path.isfile(fast):
+        return _send_cover(fast)
+
     # 构建搜索目录列表
     search_dirs = []
-    
+
     # 1. 如果提供了 filename，尝试从歌曲所在目录的 covers 子目录查找
+    # （内存歌曲索引替代按文件名的单行 SELECT）
     if filename:
-        try:
-            with get_db() as conn:
-                row = conn.execute('SELECT path FROM songs WHERE filename = ?', (unquote(filename),)).fetchone()
-                if row and row['path']:
-                    song_dir = os.path.dirname(row['path'])
-                    search_dirs.append(os.path.join(song_dir, 'covers'))
-        except Exception:
-            pass
+        song_path = _resolve_song_path(os.path.basename(unquote(filename)))
+        if song_path:
+            search_dirs.append(os.path.join(os.path.dirname(song_path), 'covers'))
     
-    # 2. 从所有挂载目录的 covers 子目录查找
-    try:
-        with get_db() as conn:
-            rows = conn.execute("SELECT path FROM mount_points").fetchall()
-            for r in rows:
-                if r['path']:
-                    search_dirs.append(os.path.join(r['path'], 'covers'))
-    except Exception:
-        pass
+    # 2. 从所有挂载目录的 covers 子目录查找（内存缓存，不走数据库）
+    for p in get_mount_points():
+        search_dirs.append(os.path.join(p, 'covers'))
     
     # 3. 从默认音乐库目录查找
     search_dirs.append(os.path.join(MUSIC_LIBRARY_PATH, 'covers'))
@@ -2025,10 +3057,10 @@ def get_cover(cover_name):
     # 去重
     search_dirs = list(dict.fromkeys(search_dirs))
     
+    # 目录清单缓存替代逐个 stat
     for cover_dir in search_dirs:
-        path = os.path.join(cover_dir, cover_name)
-        if os.path.exists(path):
-            return send_file(path, mimetype='image/jpeg')
+        if _dir_has(cover_dir, cover_name):
+            return _send_cover(os.path.join(cover_dir, cover_name))
     return jsonify({'error': 'Not found'}), 404
 
 @app.route('/api/music/upload', methods=['POST'])
@@ -2041,14 +3073,7 @@ def upload_file():
         target_dir = request.form.get('target_dir') or MUSIC_LIBRARY_PATH
         target_dir = os.path.abspath(target_dir)
         # 仅允许保存到音乐库或已添加的挂载目录（及其子目录）
-        allowed_roots = [os.path.abspath(MUSIC_LIBRARY_PATH)]
-        try:
-            with get_db() as conn:
-                rows = conn.execute("SELECT path FROM mount_points").fetchall()
-                allowed_roots.extend([os.path.abspath(r['path']) for r in rows])
-        except Exception:
-            pass
-        if not any(target_dir.startswith(root) for root in allowed_roots):
+        if not _is_in_allowed_roots(target_dir):
             return jsonify({'success': False, 'error': '无效保存路径，请先在目录管理中添加'})
         os.makedirs(target_dir, exist_ok=True)
         save_path = os.path.join(target_dir, filename)
@@ -2060,14 +3085,18 @@ def upload_file():
                 if exists:
                     return jsonify({'success': False, 'error': '该文件已存在于当前目录下'})
                 
-                # 全局查重 (文件名 + 大小)
-                file.seek(0, os.SEEK_END)
-                file_size = file.tell()
-                file.seek(0)
-                
-                dup = conn.execute("SELECT path FROM songs WHERE filename=? AND size=?", (filename, file_size)).fetchone()
-                if dup:
-                    return jsonify({'success': False, 'error': f'音乐库中已存在相同文件: {dup["path"]}'})
+                # 全局查重 (文件名 + 大小)：内存索引命中后用 exists 兜底。
+                # 优先用分片自带的 Content-Length，避免为算大小把整个
+                # 上传体先读到末尾（重复上传时白白落一遍盘）
+                file_size = file.content_length
+                if not file_size:
+                    file.seek(0, os.SEEK_END)
+                    file_size = file.tell()
+                    file.seek(0)
+
+                dup_path = _song_path_by_fsize(filename, file_size)
+                if dup_path and os.path.exists(dup_path):
+                    return jsonify({'success': False, 'error': f'音乐库中已存在相同文件: {dup_path}'})
 
         except Exception as e:
             logger.error(f"查重失败: {e}")
@@ -2094,15 +3123,14 @@ def import_music_by_path():
              # 目标已存在 (文件名冲突)
              pass
 
-        # 全局查重
+        # 全局查重（内存索引命中后用 exists 兜底）
         src_size = os.path.getsize(src_path)
-        with get_db() as conn:
-             dup = conn.execute("SELECT path FROM songs WHERE filename=? AND size=?", (filename, src_size)).fetchone()
-             if dup:
-                 # 如果已存在的文件就是目标位置的文件（即重复导入自己），则是允许的（当作刷新）
-                 # 如果 duplicates path != dst_path -> 真正的异地重复 -> 报错
-                 if dup['path'] != os.path.abspath(dst_path):
-                     return jsonify({'success': False, 'error': f'音乐库中已存在相同文件: {dup["path"]}'})
+        dup_path = _song_path_by_fsize(filename, src_size)
+        if dup_path and os.path.exists(dup_path):
+            # 如果已存在的文件就是目标位置的文件（即重复导入自己），则是允许的（当作刷新）
+            # 如果 duplicates path != dst_path -> 真正的异地重复 -> 报错
+            if dup_path != os.path.abspath(dst_path):
+                return jsonify({'success': False, 'error': f'音乐库中已存在相同文件: {dup_path}'})
 
         if not os.path.exists(dst_path):
             shutil.copy2(src_path, dst_path)
@@ -2115,16 +3143,43 @@ def import_music_by_path():
     except Exception as e: return jsonify({'success': False, 'error': str(e)})
 
 # --- 收藏夹接口 (用户隔离) ---
+def _ensure_favorites_migrated(user_hash):
+    """老版本收藏存在用户 JSON 里，首次访问时一次性搬进 user_favorites 表。
+
+    迁移后 JSON 里的列表清空，此后增删收藏只写单行，不再整份重写
+    用户文件。
+    """
+    user_data = load_user_data(user_hash)
+    legacy = user_data.get('favorites') if user_data else None
+    if not legacy:
+        return
+    conn = get_db()
+    conn.execute("BEGIN")
+    try:
+        now = time.time()
+        conn.executemany(
+            "INSERT OR IGNORE INTO user_favorites (user_hash, song_id, created_at) VALUES (?, ?, ?)",
+            [(user_hash, sid, now + i * 1e-6) for i, sid in enumerate(legacy)])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    user_data['favorites'] = []
+    save_user_data(user_hash, user_data)
+    logger.info(f"收藏已迁移至数据库: {len(legacy)} 条")
+
 @app.route('/api/favorites', methods=['GET'])
 def get_favorites():
     try:
         user_hash = session.get('user_hash')
         if not user_hash:
             return jsonify({'success': False, 'error': 'not logged in'})
-        user_data = load_user_data(user_hash)
-        if not user_data:
-            return jsonify({'success': True, 'data': []})
-        return jsonify({'success': True, 'data': user_data.get('favorites', [])})
+        _ensure_favorites_migrated(user_hash)
+        with get_db() as conn:
+            rows = conn.execute(
+                "SELECT song_id FROM user_favorites WHERE user_hash=? ORDER BY created_at",
+                (user_hash,)).fetchall()
+        return jsonify({'success': True, 'data': [r['song_id'] for r in rows]})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -2134,16 +3189,16 @@ def add_favorite(song_id):
         user_hash = session.get('user_hash')
         if not user_hash:
             return jsonify({'success': False, 'error': 'not logged in'})
-        user_data = load_user_data(user_hash)
-        if not user_data:
+        if not load_user_data(user_hash):
             return jsonify({'success': False, 'error': 'user not found'})
-        
-        favorites = user_data.get('favorites', [])
-        if song_id not in favorites:
-            favorites.append(song_id)
-            user_data['favorites'] = favorites
-            save_user_data(user_hash, user_data)
-        
+
+        _ensure_favorites_migrated(user_hash)
+        with get_db() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO user_favorites (user_hash, song_id, created_at) VALUES (?, ?, ?)",
+                (user_hash, song_id, time.time()))
+            conn.commit()
+
         logger.info(f"收藏成功: {song_id}")
         return jsonify({'success': True})
     except Exception as e:
@@ -2156,16 +3211,15 @@ def remove_favorite(song_id):
         user_hash = session.get('user_hash')
         if not user_hash:
             return jsonify({'success': False, 'error': 'not logged in'})
-        user_data = load_user_data(user_hash)
-        if not user_data:
+        if not load_user_data(user_hash):
             return jsonify({'success': False, 'error': 'user not found'})
-        
-        favorites = user_data.get('favorites', [])
-        if song_id in favorites:
-            favorites.remove(song_id)
-            user_data['favorites'] = favorites
-            save_user_data(user_hash, user_data)
-        
+
+        _ensure_favorites_migrated(user_hash)
+        with get_db() as conn:
+            conn.execute("DELETE FROM user_favorites WHERE user_hash=? AND song_id=?",
+                         (user_hash, song_id))
+            conn.commit()
+
         logger.info(f"取消收藏成功: {song_id}")
         return jsonify({'success': True})
     except Exception as e:
@@ -2401,147 +3455,43 @@ def netease_config():
 @app.route('/api/netease/debug')
 def netease_debug():
     """调试用，查看 cookie 是否加载。"""
+    with _DOWNLOAD_ACTIVE_LOCK:
+        active = _DOWNLOAD_ACTIVE
     info = {
         'cookie_loaded': bool(NETEASE_COOKIE),
         'api_base': NETEASE_API_BASE,
-        'download_dir': NETEASE_DOWNLOAD_DIR
+        'download_dir': NETEASE_DOWNLOAD_DIR,
+        'active_downloads': active,
+        'tracked_tasks': len(DOWNLOAD_TASKS)
     }
     return jsonify(info)
 
-def _normalize_cover_url(url: str):
-    if not url:
-        return None
-    u = url.replace('http://', 'https://')
-    if '//' not in u:
-        return None
-    # NetEase 图片参数：确保有清晰尺寸
-    if 'param=' not in u and '?param=' not in u:
-        sep = '&' if '?' in u else '?'
-        u = f"{u}{sep}param=1024y1024"
-    return u
-
-def run_download_task(task_id, payload):
-    song_id = payload.get('id')
-    title = (payload.get('title') or '').strip()
-    artist = (payload.get('artist') or '').strip()
-    album = (payload.get('album') or '').strip()
-    # Priority: Payload Level -> Configured Level -> Default (exhigh)
-    level = payload.get('level') or NETEASE_QUALITY or NETEASE_QUALITY_DEFAULT
-    
-    cover_url = _normalize_cover_url(payload.get('cover') or payload.get('album_art'))
-    cover_bytes = fetch_cover_bytes(cover_url) if cover_url else None
-    
-    target_dir = payload.get('target_dir') or NETEASE_DOWNLOAD_DIR
-    target_dir = os.path.abspath(target_dir)
-    
-    DOWNLOAD_TASKS[task_id]['status'] = 'preparing'
-    DOWNLOAD_TASKS[task_id]['progress'] = 0
-
-    try:
-        os.makedirs(target_dir, exist_ok=True)
-        
-        # 1. Fetch Song Detail if missing critical info
-        need_detail = (not title) or (not artist)
-        if need_detail:
-            meta_resp = call_netease_api('/song/detail', {'ids': song_id})
-            songs = meta_resp.get('songs', []) if isinstance(meta_resp, dict) else []
-            if songs:
-                info = songs[0]
-                title = info.get('name') or title
-                artist = ' / '.join([a.get('name') for a in info.get('ar', []) if a.get('name')]) or artist
-                album = (info.get('al') or {}).get('name') or album
-                if not cover_url:
-                    cover_url = _normalize_cover_url((info.get('al') or {}).get('picUrl'))
-                    if cover_url: cover_bytes = fetch_cover_bytes(cover_url)
+def _project_song_compact(song):
+    """compact=1 时只保留列表展示用得到的字段，歌单浏览不必扛全量结构。"""
+    return {k: song[k] for k in ('id', 'title', 'artist', 'album', 'duration', 'cover')
+            if k in song}
 
-        # Update Task Info
-        DOWNLOAD_TASKS[task_id]['title'] = title
-        DOWNLOAD_TASKS[task_id]['artist'] = artist
-        
-        # 2. Get Download URL
-        DOWNLOAD_TASKS[task_id]['status'] = 'downloading'
-        url_resp = call_netease_api('/song/url/v1', {'id': song_id, 'level': level})
-        data_list = url_resp.get('data', []) if isinstance(url_resp, dict) else []
-        if not data_list:
-             raise Exception('Failed to get download URL data')
-        
-        song_info = data_list[0]
-        down_url = song_info.get('url')
-        if not down_url:
-             # Try fallback to standard if high quality fails? 
-             # For now just error
-             raise Exception(f'No download URL for level: {level}')
-             
-        file_ext = (song_info.get('type') or 'mp3').lower()
-        if not file_ext.startswith('.'): file_ext = '.' + file_ext
-        
-        # Filename
-        fname = sanitize_filename(f"{artist} - {title}{file_ext}")
-        file_path = os.path.join(target_dir, fname)
-        DOWNLOAD_TASKS[task_id]['filename'] = fname
-        
-        # 3. Download File
-        size = song_info.get('size') or 0
-        dl_resp = requests.get(down_url, stream=True, timeout=30, headers=COMMON_HEADERS)
-        dl_resp.raise_for_status()
-        
-        downloaded = 0
-        with open(file_path, 'wb') as f:
-            for chunk in dl_resp.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if size > 0:
-                        percent = int(downloaded / size * 100)
-                        # Throttle updates
-                        if percent > DOWNLOAD_TASKS[task_id]['progress']:
-                            DOWNLOAD_TASKS[task_id]['progress'] = percent
-                            
-        DOWNLOAD_TASKS[task_id]['progress'] = 100
-        
-        # 4. Write Metadata
-        try:
-            # Basic Tags
-            if file_ext == '.mp3':
-                try:
-                    audio = EasyID3(file_path)
-                except:
-                    audio = File(file_path, easy=True)
-                    audio.add_tags()
-                audio['title'] = title
-                audio['artist'] = artist
-                audio['album'] = album
-                audio.save()
-            elif file_ext == '.flac':
-                audio = FLAC(file_path)
-                audio['title'] = title
-                audio['artist'] = artist
-                audio['album'] = album
-                audio.save()
-            
-            # Cover
-            if cover_bytes: 
-                embed_cover_to_file(file_path, cover_bytes)
-                if fname:
-                    save_cover_file(cover_bytes, os.path.splitext(fname)[0], target_dir)
-            
-            # Lyrics
-            lrc, _ = fetch_netease_lyrics(song_id)
-            if lrc:
-                embed_lyrics_to_file(file_path, lrc)
-                
-        except Exception as e:
-            logger.warning(f"Metadata embedding failed: {e}")
-            
-        # 5. Index
-        index_single_file(file_path)
-        
-        DOWNLOAD_TASKS[task_id]['status'] = 'success'
-        
-    except Exception as e:
-        logger.error(f"Download task failed: {e}")
-        DOWNLOAD_TASKS[task_id]['status'] = 'error'
-        DOWNLOAD_TASKS[task_id]['message'] = str(e)
+def _fast_json(obj, status=200, headers=None):
+    """大负载端点的 JSON 响应：orjson（C 实现）优先，缺失时回退 stdlib。"""
+    if orjson:
+        body = orjson.dumps(obj)
+    else:
+        body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+    return Response(body, status=status, mimetype='application/json', headers=headers)
+
+def _songs_response(payload):
+    """歌曲列表响应：支持 ?compact=1 裁剪字段，并按内容 MD5 做 ETag/304。"""
+    if request.args.get('compact') and isinstance(payload.get('data'), list):
+        payload = dict(payload)
+        payload['data'] = [_project_song_compact(s) for s in payload['data']]
+    if orjson:
+        body = orjson.dumps(payload)
+    else:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    etag = hashlib.md5(body, usedforsecurity=False).hexdigest()
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers={'ETag': etag})
+    return Response(body, mimetype='application/json', headers={'ETag': etag})
 
 @app.route('/api/netease/resolve')
 def netease_resolve():
@@ -2553,9 +3503,9 @@ def netease_resolve():
     try:
         if parsed_input['type'] == 'playlist':
             songs, name = _fetch_playlist_songs(parsed_input['id'])
-            return jsonify({'success': True, 'type': 'playlist', 'id': parsed_input['id'], 'name': name, 'data': songs})
+            return _songs_response({'success': True, 'type': 'playlist', 'id': parsed_input['id'], 'name': name, 'data': songs})
         songs = _fetch_song_detail(parsed_input['id'])
-        return jsonify({'success': True, 'type': 'song', 'id': parsed_input['id'], 'data': songs})
+        return _songs_response({'success': True, 'type': 'song', 'id': parsed_input['id'], 'data': songs})
     except Exception as e:
         logger.warning(f"解析网易云链接失败: {e}")
         return jsonify({'success': False, 'error': '解析失败，请确认歌曲或歌单链接有效'})
@@ -2569,7 +3519,7 @@ def netease_playlist_detail():
         return jsonify({'success': False, 'error': '缺少歌单链接或无法识别'})
     try:
         songs, name = _fetch_playlist_songs(parsed_input['id'])
-        return jsonify({'success': True, 'name': name, 'id': parsed_input['id'], 'data': songs})
+        return _songs_response({'success': True, 'name': name, 'id': parsed_input['id'], 'data': songs})
     except Exception as e:
         logger.warning(f"歌单获取失败: {e}")
         return jsonify({'success': False, 'error': '获取歌单失败'})
@@ -2585,29 +3535,11 @@ def netease_song_detail():
         return jsonify({'success': False, 'error': '检测到歌单链接，请切换歌单解析'})
     try:
         parsed = _fetch_song_detail(parsed_input['id'])
-        return jsonify({'success': True, 'id': parsed_input['id'], 'data': parsed})
+        return _songs_response({'success': True, 'id': parsed_input['id'], 'data': parsed})
     except Exception as e:
         logger.warning(f"获取单曲详情失败: {e}")
         return jsonify({'success': False, 'error': '获取歌曲信息失败'})
 
-        # 索引文件
-        index_single_file(target_path)
-        
-        DOWNLOAD_TASKS[task_id]['status'] = 'success'
-        DOWNLOAD_TASKS[task_id]['progress'] = 100
-        logger.info(f"网易云歌曲已下载: {filename} | {title} - {artist}")
-        
-    except Exception as e:
-        logger.warning(f"网易云下载失败: {e}")
-        DOWNLOAD_TASKS[task_id]['status'] = 'error'
-        DOWNLOAD_TASKS[task_id]['message'] = str(e)
-    finally:
-        # 10分钟后清理任务状态
-        def clean_task():
-            time.sleep(600)
-            DOWNLOAD_TASKS.pop(task_id, None)
-        threading.Thread(target=clean_task, daemon=True).start()
-
 @app.route('/api/netease/download', methods=['POST'])
 def download_netease_music():
     """根据歌曲ID下载网易云音乐到本地库。(异步)"""
@@ -2616,21 +3548,103 @@ def download_netease_music():
     if not song_id:
         return jsonify({'success': False, 'error': '缺少歌曲ID'})
 
-    active = sum(1 for t in DOWNLOAD_TASKS.values() if t.get('status') in ('pending', 'preparing', 'downloading'))
-    if active >= NETEASE_MAX_CONCURRENT:
-        return jsonify({'success': False, 'error': f'并发下载已达上限 ({NETEASE_MAX_CONCURRENT})，请稍后再试'})
-    
-    task_id = f"task_{int(time.time()*1000)}_{os.urandom(4).hex()}"
+    task_id = f"task_{secrets.token_hex(12)}"
     DOWNLOAD_TASKS[task_id] = {
-        'status': 'pending', 
-        'progress': 0, 
+        'status': 'pending',
+        'progress': 0,
         'title': payload.get('title', '未知'),
         'artist': payload.get('artist', '未知')
     }
-    
-    threading.Thread(target=run_download_task, args=(task_id, payload), daemon=True).start()
+
+    if not _submit_download(task_id, payload):
+        DOWNLOAD_TASKS.pop(task_id, None)
+        return jsonify({'success': False, 'error': f'并发下载已达上限 ({NETEASE_MAX_CONCURRENT})，请稍后再试'})
     return jsonify({'success': True, 'task_id': task_id})
 
+# 批次记录：batch_id -> {task_ids, created_at}，由任务清扫线程一并回收
+DOWNLOAD_BATCHES = {}
+
+@app.route('/api/netease/download_batch', methods=['POST'])
+def download_netease_batch():
+    """整单批量下载：一次请求把所有歌曲排进工作池，免去客户端逐首 POST。
+
+    并发仍由 DOWNLOAD_EXECUTOR 的线程数兜底，批内歌曲在池里排队。
+    返回 batch_id 供 /api/netease/batch/<batch_id> 聚合查询进度。"""
+    payload = request.json or {}
+    ids = [str(i) for i in (payload.get('ids') or []) if i]
+    if not ids:
+        return jsonify({'success': False, 'error': '缺少歌曲ID列表'})
+    target_dir = payload.get('target_dir')
+    level = payload.get('level')
+
+    # 一次逗号拼接的 /song/detail 拉全量详情（接口单次 200 个上限），
+    # 预填各任务元信息，消除每个任务各打一次详情的 N+1；
+    # 响应同时进 API 缓存，后续 resolve/重试都是缓存命中
+    details = {}
+    try:
+        for i in range(0, len(ids), 200):
+            chunk = ids[i:i + 200]
+            resp = call_netease_api('/song/detail', {'ids': ','.join(chunk)})
+            for info in (resp.get('songs', []) if isinstance(resp, dict) else []):
+                details[str(info.get('id'))] = info
+    except Exception as e:
+        logger.warning(f"批量获取歌曲详情失败: {e}")
+
+    task_ids = []
+    for sid in ids:
+        song_payload = {'id': sid}
+        if target_dir:
+            song_payload['target_dir'] = target_dir
+        if level:
+            song_payload['level'] = level
+        info = details.get(sid)
+        if info:
+            song_payload['title'] = info.get('name') or ''
+            song_payload['artist'] = ' / '.join(
+                a.get('name') for a in info.get('ar', []) if a.get('name'))
+            song_payload['album'] = (info.get('al') or {}).get('name') or ''
+            song_payload['cover'] = (info.get('al') or {}).get('picUrl') or ''
+        task_id = f"task_{secrets.token_hex(12)}"
+        DOWNLOAD_TASKS[task_id] = {
+            'status': 'pending',
+            'progress': 0,
+            'title': (info.get('name') if info else None) or '未知',
+            'artist': (song_payload.get('artist') if info else None) or '未知'
+        }
+        _submit_download(task_id, song_payload, queue=True)
+        task_ids.append(task_id)
+
+    batch_id = f"batch_{secrets.token_hex(12)}"
+    DOWNLOAD_BATCHES[batch_id] = {'task_ids': task_ids, 'created_at': time.time()}
+    return jsonify({'success': True, 'batch_id': batch_id, 'task_ids': task_ids})
+
+@app.route('/api/netease/batch/<batch_id>')
+def get_netease_batch_status(batch_id):
+    """聚合查询一个批次内全部任务的状态与总体进度。"""
+    batch = DOWNLOAD_BATCHES.get(batch_id)
+    if not batch:
+        return jsonify({'success': False, 'error': '批次不存在'})
+    tasks = {}
+    done = 0
+    progress_sum = 0
+    for tid in batch['task_ids']:
+        t = DOWNLOAD_TASKS.get(tid)
+        tasks[tid] = t
+        if t:
+            progress_sum += t.get('progress', 0)
+            if t.get('status') in ('success', 'error'):
+                done += 1
+        else:
+            # 任务记录已被清扫线程回收，视作完成
+            done += 1
+            progress_sum += 100
+    total = len(batch['task_ids'])
+    return _fast_json({'success': True, 'total': total, 'done': done,
+                       'progress': (progress_sum // total) if total else 100,
+                       'tasks': tasks})
+
+_PARAM_RE = re.compile(r'[?&]param=')
+
 def _normalize_cover_url(url: str):
     if not url:
         return None
@@ -2638,7 +3652,7 @@ def _normalize_cover_url(url: str):
     if '//' not in u:
         return None
     # NetEase 图片参数：确保有清晰尺寸
-    if 'param=' not in u and '?param=' not in u:
+    if not _PARAM_RE.search(u):
         sep = '&' if '?' in u else '?'
         u = f"{u}{sep}param=1024y1024"
     return u
@@ -2650,18 +3664,19 @@ def run_download_task(task_id, payload):
     album = (payload.get('album') or '').strip()
     level = payload.get('level') or 'exhigh'
     cover_url = _normalize_cover_url(payload.get('cover') or payload.get('album_art'))
-    cover_bytes = fetch_cover_bytes(cover_url) if cover_url else None
+    # 封面和歌词不依赖音频字节，先行提交旁路线程池，与音频下载重叠
+    cover_fut = _DL_SIDE_POOL.submit(fetch_cover_bytes, cover_url) if cover_url else None
+    detail_pic_url = None
     target_dir = payload.get('target_dir') or NETEASE_DOWNLOAD_DIR
     target_dir = os.path.abspath(target_dir)
-    
-    target_dir = os.path.abspath(target_dir)
-    
+
     DOWNLOAD_TASKS[task_id]['status'] = 'preparing'
 
     try:
         os.makedirs(target_dir, exist_ok=True)
+        lyrics_fut = _DL_SIDE_POOL.submit(fetch_netease_lyrics, song_id)
         need_detail_for_level = not payload.get('level')
-        need_detail_for_cover = cover_bytes is None
+        need_detail_for_cover = cover_fut is None
         if not title or need_detail_for_level or need_detail_for_cover:
             # 拉取歌曲详情补充元信息、下载音质和封面
             meta_resp = call_netease_api('/song/detail', {'ids': song_id})
@@ -2673,10 +3688,9 @@ def run_download_task(task_id, payload):
                 title = info.get('name') or title or f"未命名 {song_id}"
                 artist = ' / '.join([a.get('name') for a in info.get('ar', []) if a.get('name')]) or artist
                 album = (info.get('al') or {}).get('name') or album
-                if need_detail_for_cover and not cover_bytes:
-                    pic_url = _normalize_cover_url((info.get('al') or {}).get('picUrl'))
-                    if pic_url:
-                        cover_bytes = fetch_cover_bytes(pic_url)
+                detail_pic_url = _normalize_cover_url((info.get('al') or {}).get('picUrl'))
+                if need_detail_for_cover and detail_pic_url:
+                    cover_fut = _DL_SIDE_POOL.submit(fetch_cover_bytes, detail_pic_url)
                 base_filename = sanitize_filename(f"{artist or '未知艺术家'} - {title}")
         if not title:
             title = f"未命名 {song_id}"
@@ -2717,43 +3731,93 @@ def run_download_task(task_id, payload):
         filename = base_filename if base_filename.lower().endswith(f".{ext}") else f"{base_filename}.{ext}"
         target_path = os.path.join(target_dir, filename)
 
-        counter = 1
-        while os.path.exists(target_path):
+        if os.path.exists(target_path):
+            # 一次目录扫描收集已占用的 (k) 序号，取最大值+1；
+            # 替代逐个候选 stat 的 while 探测
+            pat = re.compile(re.escape(base_filename) + r' \((\d+)\)\.' + re.escape(ext) + '$')
+            used = set()
+            try:
+                with os.scandir(target_dir) as it:
+                    for entry in it:
+                        m = pat.match(entry.name)
+                        if m:
+                            used.add(int(m.group(1)))
+            except OSError:
+                pass
+            counter = max(used) + 1 if used else 1
             filename = f"{base_filename} ({counter}).{ext}"
             target_path = os.path.join(target_dir, filename)
-            counter += 1
 
         tmp_path = target_path + ".part"
         DOWNLOAD_TASKS[task_id]['status'] = 'downloading'
         try:
-            with requests.get(download_url, stream=True, timeout=20, headers=COMMON_HEADERS) as resp:
+            # 走共享会话：批量下载时对同一 CDN 复用连接，免去逐次握手
+            with _NETEASE_SESSION.get(download_url, stream=True, timeout=20) as resp:
                 resp.raise_for_status()
                 total_size = int(resp.headers.get('content-length', 0))
                 downloaded = 0
-                
-                with open(tmp_path, 'wb') as f:
-                    for chunk in resp.iter_content(chunk_size=8192):
+                last_pct = -1
+                last_pub = time.monotonic()
+
+                # 256KB 大块 + 1MB 写缓冲：10MB 的 FLAC 从 ~1300 次循环
+                # 降到 ~40 次，系统调用也随之减少
+                with open(tmp_path, 'wb', buffering=1 << 20) as f:
+                    for chunk in resp.iter_content(chunk_size=262144):
                         if chunk:
                             f.write(chunk)
                             downloaded += len(chunk)
                             if total_size > 0:
+                                # 进度节流：变化了且距上次发布 >0.25s 才写共享字典
                                 progress = int((downloaded / total_size) * 100)
-                                DOWNLOAD_TASKS[task_id]['progress'] = progress
+                                now = time.monotonic()
+                                if progress != last_pct and now - last_pub > 0.25:
+                                    DOWNLOAD_TASKS[task_id]['progress'] = progress
+                                    last_pct = progress
+                                    last_pub = now
                                 
-            shutil.move(tmp_path, target_path)
+            # 同目录改名：os.replace 是单次原子 rename，
+            # 不走 shutil.move 的 stat/跨设备回退逻辑
+            os.replace(tmp_path, target_path)
         finally:
+            # 下载中途抛异常时清掉残留的 .part
             if os.path.exists(tmp_path):
                 try: os.remove(tmp_path)
                 except: pass
             
+        # 音频已落盘，这时才收割旁路抓取的封面/歌词结果；
+        # 旁路失败不影响主下载
+        cover_bytes = None
+        if cover_fut is not None:
+            try:
+                cover_bytes = cover_fut.result(timeout=15)
+            except Exception:
+                cover_bytes = None
+        if cover_bytes is None and cover_url:
+            # 载荷里的封面地址可能已失效，回退到 /song/detail 的 picUrl
+            # 再试一次（详情多数路径已拉过，且有接口缓存兜底）
+            try:
+                if detail_pic_url is None:
+                    meta_resp = call_netease_api('/song/detail', {'ids': song_id})
+                    songs = meta_resp.get('songs', []) if isinstance(meta_resp, dict) else []
+                    if songs:
+                        detail_pic_url = _normalize_cover_url((songs[0].get('al') or {}).get('picUrl'))
+                if detail_pic_url and detail_pic_url != cover_url:
+                    cover_bytes = fetch_cover_bytes(detail_pic_url)
+            except Exception:
+                cover_bytes = None
+
         # 索引文件
         base_name_for_cover = os.path.splitext(os.path.basename(target_path))[0]
         if cover_bytes:
-            embed_cover_to_file(target_path, cover_bytes)
             # 保存封面到下载目录
             save_cover_file(cover_bytes, base_name_for_cover, target_dir)
         # 保存并内嵌歌词（无需登录）
-        lrc_text, yrc_text = fetch_netease_lyrics(song_id)
+        try:
+            lrc_text, yrc_text = lyrics_fut.result(timeout=15)
+        except Exception:
+            lrc_text = yrc_text = None
+        # 封面和歌词合并成一次打开/保存，不再各自重写一遍文件
+        embed_tags_to_file(target_path, cover_bytes=cover_bytes, lrc_text=lrc_text)
         # 使用下载目录的 lyrics 子目录
         lyrics_save_dir = os.path.join(target_dir, 'lyrics')
         if lrc_text:
@@ -2764,7 +3828,6 @@ def run_download_task(task_id, payload):
                     f.write(lrc_text)
             except Exception as e:
                 logger.warning(f"保存歌词失败: {e}")
-            embed_lyrics_to_file(target_path, lrc_text)
         if yrc_text:
             try:
                 os.makedirs(lyrics_save_dir, exist_ok=True)
@@ -2772,8 +3835,9 @@ def run_download_task(task_id, payload):
                     f.write(yrc_text)
             except Exception as e:
                 logger.warning(f"保存逐字歌词失败: {e}")
-        index_single_file(target_path)
-        
+        # 交给聚合线程批量建索引：歌单下载整批只 commit 一次
+        PENDING_INDEX.put(target_path)
+
         DOWNLOAD_TASKS[task_id]['status'] = 'success'
         DOWNLOAD_TASKS[task_id]['progress'] = 100
         logger.info(f"网易云歌曲已下载: {filename} | {title} - {artist}")
@@ -2783,18 +3847,18 @@ def run_download_task(task_id, payload):
         DOWNLOAD_TASKS[task_id]['status'] = 'error'
         DOWNLOAD_TASKS[task_id]['message'] = str(e)
     finally:
-        # 10分钟后清理任务状态
-        def clean_task():
-            time.sleep(600)
-            DOWNLOAD_TASKS.pop(task_id, None)
-        threading.Thread(target=clean_task, daemon=True).start()
+        # 打上结束时间，由统一的清扫线程负责清理
+        task = DOWNLOAD_TASKS.get(task_id)
+        if task is not None:
+            task['finished_at'] = time.time()
 
 @app.route('/api/netease/task/<task_id>')
 def get_netease_task_status(task_id):
     task = DOWNLOAD_TASKS.get(task_id)
     if not task:
         return jsonify({'success': False, 'error': '任务不存在'})
-    return jsonify({'success': True, 'data': task})
+    # 任务轮询频率高，走 orjson 快速序列化
+    return _fast_json({'success': True, 'data': task})
 
 @app.route('/api/music/external/meta')
 def get_external_meta():
@@ -2814,7 +3878,7 @@ def get_external_meta():
              if conn.execute("SELECT 1 FROM songs WHERE id=?", (song_id,)).fetchone():
                  in_library = True
 
-        return jsonify({'success': True, 'data': {'id': song_id, 'filename': path, 'title': meta['title'] or os.path.basename(path), 'artist': meta['artist'] or '未知艺术家', 'album': meta['album'] or '', 'album_art': album_art, 'in_library': in_library}})
+        return _fast_json({'success': True, 'data': {'id': song_id, 'filename': path, 'title': meta['title'] or os.path.basename(path), 'artist': meta['artist'] or '未知艺术家', 'album': meta['album'] or '', 'album_art': album_art, 'in_library': in_library}})
     except Exception as e: return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/music/external/play')
@@ -2922,14 +3986,66 @@ MIGfMA0GCSqGSIb3DQEBAQUAA4GNADCBiQKBgQDEIxgwoutfwoJxcGQeedgP7FG9qaIuS0qzfR8gWkrk
 QIMEI_SECRET = "ZdJqM15EeO2zWc08"
 QIMEI_APP_KEY = "0AND0HD6FE4HY80F"
 
+# RSA 公钥对象缓存：PEM/ASN.1 解析只做一次。
+# cryptography 是可选依赖，保持惰性导入
+_QIMEI_PUB_KEY = None
+
+def _get_qimei_public_key():
+    global _QIMEI_PUB_KEY
+    if _QIMEI_PUB_KEY is None:
+        from cryptography.hazmat.primitives import serialization
+        _QIMEI_PUB_KEY = serialization.load_pem_public_key(QIMEI_PUBLIC_KEY.encode())
+    return _QIMEI_PUB_KEY
+
 import json as json_module
 from base64 import b64encode, b64decode
 
+def _dumps_setting(obj) -> str:
+    """凭证/设备信息落库用的序列化：orjson 优先，缺失回退 stdlib。"""
+    if orjson:
+        return orjson.dumps(obj).decode('utf-8')
+    return json_module.dumps(obj)
+
+def _loads_setting(raw):
+    if orjson:
+        return orjson.loads(raw)
+    return json_module.loads(raw)
+
+def _dumps_compact(obj) -> bytes:
+    """紧凑 JSON 字节串：orjson 优先，stdlib 回退对齐 orjson 的输出格式。"""
+    if orjson:
+        return orjson.dumps(obj)
+    return json_module.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+# QQ 音乐/腾讯接口会话：连接池 + keep-alive + 对网关错误轻量重试。
+# 登录授权需要独立 cookie 罐，不走共享会话，只共用 adapter 连接池
+_qq_adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32,
+                          max_retries=Retry(total=2, backoff_factor=0.2,
+                                            status_forcelist=[502, 503, 504]))
+_QQ_SESSION = requests.Session()
+_QQ_SESSION.mount('https://', _qq_adapter)
+
+# 签名/登录流程里的正则统一在模块级编译一次，省掉热路径上的缓存查找
+_RE_B64STRIP = re.compile(rb'[\\/+=]')
+_RE_PTUICB = re.compile(r"ptuiCB\((.*?)\)")
+_RE_PTSIGX = re.compile(r"&ptsigx=(.+?)&s_url")
+_RE_UIN = re.compile(r"&uin=(.+?)&service")
+_RE_WX_UUID = re.compile(r"uuid=(.+?)\"")
+_RE_WX_STATUS = re.compile(r"window\.wx_errcode=(\d+);window\.wx_code='([^']*)'")
+_RE_OAUTH_ERROR = re.compile(r'error=(\d+)')
+_RE_OAUTH_CODE = re.compile(r"(?<=code=)(.+?)(?=&)")
+
+# 签名常量（索引 40 在 JS 实现里越界被忽略，这里预先过滤掉）
+_SIGN_PART1_IDX = tuple(i for i in (23, 14, 6, 36, 16, 40, 7, 19) if i < 40)
+_SIGN_PART2_IDX = (16, 1, 32, 12, 19, 27, 8, 5)
+_SIGN_SCRAMBLE = bytes([89, 39, 179, 150, 218, 82, 58, 252, 177, 52, 186, 123,
+                        120, 64, 242, 133, 143, 161, 121, 179])
+
 def _save_qqmusic_credential(credential: dict):
     """保存 QQ 音乐登录凭证到数据库"""
     try:
         with get_db() as conn:
-            value = json_module.dumps(credential) if credential else ''
+            value = _dumps_setting(credential) if credential else ''
             conn.execute("INSERT OR REPLACE INTO system_settings (key, value) VALUES (?, ?)", 
                         ('qqmusic_credential', value))
             conn.commit()
@@ -2944,7 +4060,7 @@ def _load_qqmusic_credential():
         with get_db() as conn:
             row = conn.execute("SELECT value FROM system_settings WHERE key = ?", ('qqmusic_credential',)).fetchone()
             if row and row['value']:
-                QQMUSIC_CREDENTIAL = json_module.loads(row['value'])
+                QQMUSIC_CREDENTIAL = _loads_setting(row['value'])
                 logger.info(f"[QQ音乐] 凭证已加载: musicid={QQMUSIC_CREDENTIAL.get('musicid')}")
                 return QQMUSIC_CREDENTIAL
     except Exception as e:
@@ -3041,7 +4157,6 @@ def _start_qqmusic_credential_refresh_task():
 
 def _random_imei():
     """生成随机 IMEI 号码"""
-    import random
     imei = []
     sum_ = 0
     for i in range(14):
@@ -3059,11 +4174,9 @@ def _random_imei():
 def _get_qqmusic_device():
     """获取或生成 QQ 音乐设备信息"""
     global QQMUSIC_DEVICE
-    import random
     import string
     import binascii
-    from uuid import uuid4
-    
+
     if QQMUSIC_DEVICE:
         return QQMUSIC_DEVICE
     
@@ -3072,7 +4185,7 @@ def _get_qqmusic_device():
         with get_db() as conn:
             row = conn.execute("SELECT value FROM system_settings WHERE key = ?", ('qqmusic_device',)).fetchone()
             if row and row['value']:
-                QQMUSIC_DEVICE = json_module.loads(row['value'])
+                QQMUSIC_DEVICE = _loads_setting(row['value'])
                 return QQMUSIC_DEVICE
     except Exception:
         pass
@@ -3099,7 +4212,7 @@ def _get_qqmusic_device():
     try:
         with get_db() as conn:
             conn.execute("INSERT OR REPLACE INTO system_settings (key, value) VALUES (?, ?)",
-                        ('qqmusic_device', json_module.dumps(QQMUSIC_DEVICE)))
+                        ('qqmusic_device', _dumps_setting(QQMUSIC_DEVICE)))
             conn.commit()
     except Exception:
         pass
@@ -3108,7 +4221,6 @@ def _get_qqmusic_device():
 
 def _random_beacon_id():
     """生成随机 BeaconID"""
-    import random
     from datetime import datetime
     
     beacon_id = ""
@@ -3129,20 +4241,15 @@ def _random_beacon_id():
     return beacon_id
 
 def _calc_md5(*strings):
-    """计算 MD5 值"""
-    md5 = hashlib.md5()
-    for item in strings:
-        if isinstance(item, bytes):
-            md5.update(item)
-        elif isinstance(item, str):
-            md5.update(item.encode())
-    return md5.hexdigest()
+    """计算 MD5 值（签名入参都是短串，拼一次再喂哈希，省掉逐段 update）"""
+    joined = b''.join(
+        item if isinstance(item, bytes) else item.encode()
+        for item in strings if isinstance(item, (bytes, str)))
+    return hashlib.md5(joined, usedforsecurity=False).hexdigest()
 
 def _get_qqmusic_qimei(version: str = "13.2.5.8"):
     """获取 QIMEI36"""
     global QQMUSIC_QIMEI, QQMUSIC_DEVICE
-    import random
-    import base64
     from datetime import datetime, timedelta
     
     device = _get_qqmusic_device()
@@ -3159,14 +4266,23 @@ def _get_qqmusic_qimei(version: str = "13.2.5.8"):
         from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
         
         def rsa_encrypt(content: bytes) -> bytes:
-            key = serialization.load_pem_public_key(QIMEI_PUBLIC_KEY.encode())
-            return key.encrypt(content, padding.PKCS1v15())
+            return _get_qimei_public_key().encrypt(content, padding.PKCS1v15())
         
-        def aes_encrypt(key: bytes, content: bytes) -> bytes:
-            cipher = Cipher(algorithms.AES(key), modes.CBC(key))
-            padding_size = 16 - len(content) % 16
-            encryptor = cipher.encryptor()
-            return encryptor.update(content + (padding_size * chr(padding_size)).encode()) + encryptor.finalize()
+        # AES-CBC：优先 PyCryptodome（C 核心自动分派 AES-NI 指令），
+        # 缺失时回退 cryptography。协议规定 key 同时作 IV，远端按此解密，
+        # 不能换成随机 IV
+        try:
+            from Crypto.Cipher import AES as _AES
+            from Crypto.Util.Padding import pad as _aes_pad
+
+            def aes_encrypt(key: bytes, content: bytes) -> bytes:
+                return _AES.new(key, _AES.MODE_CBC, iv=key).encrypt(_aes_pad(content, 16))
+        except ImportError:
+            def aes_encrypt(key: bytes, content: bytes) -> bytes:
+                cipher = Cipher(algorithms.AES(key), modes.CBC(key))
+                padding_size = 16 - len(content) % 16
+                encryptor = cipher.encryptor()
+                return encryptor.update(content + bytes([padding_size]) * padding_size) + encryptor.finalize()
         
         # 构建 payload
         fixed_rand = random.randint(0, 14400)
@@ -3188,7 +4304,6 @@ def _get_qqmusic_qimei(version: str = "13.2.5.8"):
             "kernel": device['proc_version'],
         }
         
-        import json as json_lib
         payload = {
             "androidId": device['android_id'],
             "platformId": 1,
@@ -3214,18 +4329,19 @@ def _get_qqmusic_qimei(version: str = "13.2.5.8"):
             "packageId": "com.tencent.qqmusic",
             "deviceType": "Phone",
             "sdkName": "",
-            "reserved": json_lib.dumps(reserved, separators=(',', ':')),
+            "reserved": _dumps_compact(reserved).decode('utf-8'),
         }
         
-        crypt_key = "".join(random.choices("adbcdef1234567890", k=16))
-        nonce = "".join(random.choices("adbcdef1234567890", k=16))
+        # AES 密钥用 CSPRNG 生成；顺带比 random.choices 的逐字符采样快
+        crypt_key = secrets.token_hex(8)
+        nonce = secrets.token_hex(8)
         ts = int(time.time())
         key = base64.b64encode(rsa_encrypt(crypt_key.encode())).decode()
-        params = base64.b64encode(aes_encrypt(crypt_key.encode(), json_lib.dumps(payload, separators=(',', ':')).encode())).decode()
+        params = base64.b64encode(aes_encrypt(crypt_key.encode(), _dumps_compact(payload))).decode()
         extra = '{"appKey":"' + QIMEI_APP_KEY + '"}'
         sign = _calc_md5(key, params, str(ts * 1000), nonce, QIMEI_SECRET, extra)
         
-        resp = requests.post(
+        resp = _QQ_SESSION.post(
             "https://api.tencentmusic.com/tme/trpc/proxy",
             headers={
                 "Host": "api.tencentmusic.com",
@@ -3252,7 +4368,7 @@ def _get_qqmusic_qimei(version: str = "13.2.5.8"):
         )
         
         resp_data = resp.json()
-        data = json_lib.loads(resp_data["data"])["data"]
+        data = json.loads(resp_data["data"])["data"]
         QQMUSIC_QIMEI = data["q36"]
         
         # 保存到设备信息
@@ -3261,7 +4377,7 @@ def _get_qqmusic_qimei(version: str = "13.2.5.8"):
         try:
             with get_db() as conn:
                 conn.execute("INSERT OR REPLACE INTO system_settings (key, value) VALUES (?, ?)",
-                            ('qqmusic_device', json_module.dumps(device)))
+                            ('qqmusic_device', _dumps_setting(device)))
                 conn.commit()
         except Exception:
             pass
@@ -3279,32 +4395,23 @@ def _get_qqmusic_guid():
     """获取或生成 QQ 音乐 GUID (现在返回 QIMEI)"""
     return _get_qqmusic_qimei()
 
-def _qqmusic_sign(request_data: dict) -> str:
-    """QQ 音乐请求签名 - 完全按照 QQMusicApi 实现"""
-    import re
-    import json
-    
-    PART_1_INDEXES = [23, 14, 6, 36, 16, 40, 7, 19]
-    PART_2_INDEXES = [16, 1, 32, 12, 19, 27, 8, 5]
-    SCRAMBLE_VALUES = [89, 39, 179, 150, 218, 82, 58, 252, 177, 52, 186, 123, 120, 64, 242, 133, 143, 161, 121, 179]
-    
-    # JavaScript quirks emulation - 过滤超出范围的索引
-    part1_indexes = list(filter(lambda x: x < 40, PART_1_INDEXES))
-    
-    # 使用 json 序列化（orjson 可能不可用）
-    # 注意：需要 separators 去除空格以匹配 orjson 的紧凑输出
-    json_bytes = json.dumps(request_data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
-    hash_str = hashlib.sha1(json_bytes).hexdigest().upper()
-    
-    part1 = ''.join(hash_str[i] for i in part1_indexes)
-    part2 = ''.join(hash_str[i] for i in PART_2_INDEXES)
-    
-    part3 = bytearray(20)
-    for i, v in enumerate(SCRAMBLE_VALUES):
-        value = v ^ int(hash_str[i * 2: i * 2 + 2], 16)
-        part3[i] = value
-    
-    b64_part = re.sub(rb'[\\/+=]', b'', b64encode(part3)).decode('utf-8')
+def _qqmusic_sign(request_data) -> str:
+    """QQ 音乐请求签名 - 完全按照 QQMusicApi 实现。
+
+    接受 dict 或已序列化好的紧凑 JSON 字节串；传字节串可以让调用方
+    签名和请求体共用同一次序列化。
+    """
+    json_bytes = request_data if isinstance(request_data, bytes) else _dumps_compact(request_data)
+    digest = hashlib.sha1(json_bytes, usedforsecurity=False).digest()
+    hash_str = digest.hex().upper()
+
+    part1 = ''.join(hash_str[i] for i in _SIGN_PART1_IDX)
+    part2 = ''.join(hash_str[i] for i in _SIGN_PART2_IDX)
+
+    # 混淆表直接和 SHA1 原始字节异或，省掉逐对十六进制切片再 int(x, 16)
+    part3 = bytes(v ^ b for v, b in zip(_SIGN_SCRAMBLE, digest))
+
+    b64_part = _RE_B64STRIP.sub(b'', b64encode(part3)).decode('utf-8')
     return f'zzc{part1}{b64_part}{part2}'.lower()
 
 def _call_qqmusic_api_direct(module: str, method: str, params: dict = None, extra_common: dict = None):
@@ -3316,7 +4423,6 @@ def _call_qqmusic_api_direct(module: str, method: str, params: dict = None, extr
         params: API 参数
         extra_common: 额外的 common 参数 (如 tmeLoginType)
     """
-    import random
     global QQMUSIC_CREDENTIAL
     
     guid = _get_qqmusic_guid()
@@ -3374,10 +4480,12 @@ def _call_qqmusic_api_direct(module: str, method: str, params: dict = None, extr
     }
     
     try:
-        # 尝试使用签名端点
+        # 尝试使用签名端点。请求体只序列化一次，签名和 POST 共用同一份字节，
+        # 也保证了签名覆盖的内容与实际发出的完全一致
+        body = _dumps_compact(request_data)
         url = 'https://u.y.qq.com/cgi-bin/musics.fcg'
-        sign_val = _qqmusic_sign(request_data)
-        resp = requests.post(url, params={'sign': sign_val}, json=request_data, headers=headers, cookies=cookies, timeout=15)
+        sign_val = _qqmusic_sign(body)
+        resp = _QQ_SESSION.post(url, params={'sign': sign_val}, data=body, headers=headers, cookies=cookies, timeout=15)
         resp.raise_for_status()
         data = resp.json()
         result = data.get(request_key, {})
@@ -3387,7 +4495,7 @@ def _call_qqmusic_api_direct(module: str, method: str, params: dict = None, extr
         if code == 2000:
             logger.info(f"[QQ音乐] 签名端点失败，尝试无签名端点: {module}.{method}")
             url_nosign = 'https://u.y.qq.com/cgi-bin/musicu.fcg'
-            resp = requests.post(url_nosign, json=request_data, headers=headers, cookies=cookies, timeout=15)
+            resp = _QQ_SESSION.post(url_nosign, data=body, headers=headers, cookies=cookies, timeout=15)
             resp.raise_for_status()
             data = resp.json()
             result = data.get(request_key, {})
@@ -3401,17 +4509,19 @@ def _call_qqmusic_api_direct(module: str, method: str, params: dict = None, extr
         raise
 
 def _qqmusic_hash33(s: str, h: int = 0) -> int:
-    """QQ 音乐 hash33 算法"""
-    for c in s:
-        h = (h << 5) + h + ord(c)
-        h = h & 0xFFFFFFFF
-    return h
+    """QQ 音乐 hash33 算法。
+
+    直接迭代 UTF-8 字节省掉逐字符 ord()，掩码只在返回前做一次
+    （输入很短，中间值不会大到有影响）。
+    """
+    for b in s.encode():
+        h = h * 33 + b
+    return h & 0xFFFFFFFF
 
 def _get_qq_qrcode():
     """获取 QQ 登录二维码"""
-    import random
     try:
-        resp = requests.get(
+        resp = _QQ_SESSION.get(
             'https://ssl.ptlogin2.qq.com/ptqrshow',
             params={
                 'appid': '716027609',
@@ -3440,7 +4550,7 @@ def _get_qq_qrcode():
 def _get_wx_qrcode():
     """获取微信登录二维码"""
     try:
-        resp = requests.get(
+        resp = _QQ_SESSION.get(
             'https://open.weixin.qq.com/connect/qrconnect',
             params={
                 'appid': 'wx48db31d50e334801',
@@ -3452,13 +4562,12 @@ def _get_wx_qrcode():
             },
             timeout=10
         )
-        import re
-        match = re.findall(r"uuid=(.+?)\"", resp.text)
+        match = _RE_WX_UUID.findall(resp.text)
         if not match:
             return None, None
         uuid = match[0]
         # 获取二维码图片
-        qr_resp = requests.get(
+        qr_resp = _QQ_SESSION.get(
             f'https://open.weixin.qq.com/connect/qrcode/{uuid}',
             headers={'Referer': 'https://open.weixin.qq.com/connect/qrconnect'},
             timeout=10
@@ -3501,11 +4610,13 @@ def _check_qq_qrcode(qrsig: str):
             'Accept': '*/*',
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
             'Connection': 'keep-alive',
-            'Cookie': f'qrsig={qrsig}'
         }
-        
-        resp = requests.get(
+
+        # qrsig 走 cookies 参数而非手写 Cookie 头：共享会话罐里若有旧值，
+        # 按请求传入的会覆盖它
+        resp = _QQ_SESSION.get(
             'https://ssl.ptlogin2.qq.com/ptqrlogin',
+            cookies={'qrsig': qrsig},
             params={
                 'u1': 'https://graph.qq.com/oauth2.0/login_jump',
                 'ptqrtoken': ptqrtoken,
@@ -3533,8 +4644,7 @@ def _check_qq_qrcode(qrsig: str):
             logger.warning("[QQ二维码] 请求被拒绝 (403)，可能是频率限制")
             return 'scan', None
         
-        import re
-        match = re.search(r"ptuiCB\((.*?)\)", resp.text)
+        match = _RE_PTUICB.search(resp.text)
         if not match:
             logger.warning(f"[QQ二维码] 无法解析响应: '{resp.text[:500]}'")
             return 'scan', None
@@ -3548,8 +4658,8 @@ def _check_qq_qrcode(qrsig: str):
             # 登录成功，提取 sigx 和 uin，并立即进行授权
             redirect_url = data[2] if len(data) > 2 else ''
             logger.info(f"[QQ二维码] 登录成功，重定向URL: {redirect_url[:100]}...")
-            sigx = re.findall(r"&ptsigx=(.+?)&s_url", redirect_url)
-            uin = re.findall(r"&uin=(.+?)&service", redirect_url)
+            sigx = _RE_PTSIGX.findall(redirect_url)
+            uin = _RE_UIN.findall(redirect_url)
             
             if sigx and uin:
                 logger.info(f"[QQ二维码] 提取成功: uin={uin[0]}, sigx长度={len(sigx[0])}")
@@ -3610,14 +4720,13 @@ def _check_wx_qrcode(uuid: str):
         return 'error', None
     
     try:
-        resp = requests.get(
+        resp = _QQ_SESSION.get(
             'https://lp.open.weixin.qq.com/connect/l/qrconnect',
             params={'uuid': uuid, '_': str(int(time.time()) * 1000)},
             headers={'Referer': 'https://open.weixin.qq.com/'},
             timeout=30
         )
-        import re
-        match = re.search(r"window\.wx_errcode=(\d+);window\.wx_code=\'([^\']*)\'", resp.text)
+        match = _RE_WX_STATUS.search(resp.text)
         if not match:
             return 'error', None
         wx_errcode = int(match.group(1))
@@ -3663,7 +4772,9 @@ def _authorize_qq_login(uin: str, sigx: str):
     global QQMUSIC_CREDENTIAL
     try:
         logger.info(f"[QQ授权] 开始授权流程: uin={uin}")
+        # 每次授权用独立会话隔离 cookie，但挂共享 adapter 复用连接池
         session = requests.Session()
+        session.mount('https://', _qq_adapter)
         # 第一步：check_sig
         resp = session.get(
             'https://ssl.ptlogin2.graph.qq.com/check_sig',
@@ -3698,7 +4809,6 @@ def _authorize_qq_login(uin: str, sigx: str):
         logger.info(f"[QQ授权] 获取 p_skey 成功")
         
         # 第二步：authorize
-        from uuid import uuid4
         resp = session.post(
             'https://graph.qq.com/oauth2.0/authorize',
             data={
@@ -3721,10 +4831,9 @@ def _authorize_qq_login(uin: str, sigx: str):
         )
         location = resp.headers.get('Location', '')
         logger.info(f"[QQ授权] authorize 响应 Location: {location[:100] if location else 'None'}...")
-        import re
-        
+
         # 检查是否有错误码
-        error_match = re.search(r'error=(\d+)', location)
+        error_match = _RE_OAUTH_ERROR.search(location)
         if error_match:
             error_code = error_match.group(1)
             if error_code == '100046':
@@ -3733,7 +4842,7 @@ def _authorize_qq_login(uin: str, sigx: str):
                 logger.warning(f"[QQ授权] QQ OAuth 返回错误: {error_code}")
             return None
         
-        code_match = re.findall(r"(?<=code=)(.+?)(?=&)", location)
+        code_match = _RE_OAUTH_CODE.findall(location)
         if not code_match:
             logger.warning(f"[QQ授权] 获取 code 失败, Location: {location}")
             return None
@@ -3826,8 +4935,7 @@ def call_qqmusic_api(category: str, method: str, params: dict = None) -> dict:
                 search_type = params.get('search_type', 0)
                 
                 # 生成 searchid
-                import random
-                searchid = ''.join(random.choices('0123456789', k=18))
+                searchid = str(secrets.randbelow(10 ** 18)).zfill(18)
                 
                 result = _call_qqmusic_api_direct(
                     'music.search.SearchCgiService',
@@ -3965,7 +5073,6 @@ def call_qqmusic_api(category: str, method: str, params: dict = None) -> dict:
                 )
                 
                 # 解析歌词
-                import base64
                 lyric_data = {}
                 data = result.get('data', result)
                 
@@ -4955,7 +6062,7 @@ def get_qqmusic_task_status(task_id):
     task = QQMUSIC_DOWNLOAD_TASKS.get(task_id)
     if not task:
         return jsonify({'success': False, 'error': '任务不存在'})
-    return jsonify({'success': True, 'data': task})
+    return _fast_json({'success': True, 'data': task})
 
 @app.route('/api/qqmusic/playlist/parse', methods=['POST'])
 def parse_qqmusic_playlist():
@@ -6138,6 +7245,15 @@ def admin_get_user(user_id):
             return jsonify({'success': False, 'error': '用户不存在'})
         with open(filepath, 'r', encoding='utf-8') as f:
             user_data = json.load(f)
+        # 收藏已迁入 user_favorites 表，JSON 里的列表只剩未迁移的老数据
+        fav_count = len(user_data.get('favorites', []))
+        try:
+            with get_db() as conn:
+                row = conn.execute("SELECT COUNT(*) AS c FROM user_favorites WHERE user_hash=?",
+                                   (user_id,)).fetchone()
+                fav_count += row['c'] if row else 0
+        except Exception:
+            pass
         return jsonify({
             'success': True,
             'user': {
@@ -6145,7 +7261,7 @@ def admin_get_user(user_id):
                 'username': user_data.get('username', ''),
                 'is_admin': user_data.get('is_admin', False),
                 'created_at': user_data.get('created_at'),
-                'favorites_count': len(user_data.get('favorites', [])),
+                'favorites_count': fav_count,
                 'playlists_count': len(user_data.get('playlists', []))
             }
         })
@@ -6167,6 +7283,15 @@ def admin_delete_user(user_id):
         if user_data.get('is_admin'):
             return jsonify({'success': False, 'error': '不能删除管理员账户'})
         os.remove(filepath)
+        with _USER_CACHE_LOCK:
+            _USER_CACHE.pop(user_id, None)
+        # 同步清理迁入数据库的收藏
+        try:
+            with get_db() as conn:
+                conn.execute("DELETE FROM user_favorites WHERE user_hash=?", (user_id,))
+                conn.commit()
+        except Exception:
+            pass
         return jsonify({'success': True})
     except Exception as e:
         logger.error(f'删除用户失败: {e}')
@@ -648,10 +648,21 @@ if (ui.fpProgressBar) {
 async function checkAndFetchMetadata(track, fetchId) {
   const query = `?title=${encodeURIComponent(track.title)}&artist=${encodeURIComponent(track.artist)}&filename=${encodeURIComponent(track.filename)}`;
 
+  // 本地没有时服务端转后台抓取并返回 pending；带 wait=1 让服务端等一小会，
+  // 还在抓就再等几轮（重复请求会合并到同一个后台任务上）
+  const fetchUntilDone = async (call) => {
+    let d = await call(`${query}&wait=1`);
+    for (let i = 0; i < 3 && !d.success && d.pending; i++) {
+      if (fetchId !== state.currentFetchId) return d;
+      d = await call(`${query}&wait=1`);
+    }
+    return d;
+  };
+
   const fetchLyrics = async () => {
     if (track.lyrics) return;
     try {
-      const d = await api.library.lyrics(query);
+      const d = await fetchUntilDone(api.library.lyrics);
       if (fetchId !== state.currentFetchId) return;
       if (d.success && d.lyrics) { track.lyrics = d.lyrics; savePlaylist(); parseAndRenderLyrics(d.lyrics); }
       else { renderNoLyrics('暂无歌词'); }
@@ -661,7 +672,7 @@ async function checkAndFetchMetadata(track, fetchId) {
   const fetchCover = async () => {
     if (!track.cover.includes('ICON_256.PNG')) return;
     try {
-      const d = await api.library.albumArt(query);
+      const d = await fetchUntilDone(api.library.albumArt);
       if (fetchId !== state.currentFetchId) return;
       if (d.success && d.album_art) {
         track.cover = d.album_art;
@@ -393,13 +393,23 @@ async function fetchMetadata(track) {
     const query = `?title=${encodeURIComponent(track.title)}&artist=${encodeURIComponent(track.artist)}&filename=${encodeURIComponent(track.filename)}`;
     const cacheKeyBase = track.filename || track.title; // Fallback
 
+    // 本地没有时服务端转后台抓取并返回 pending；带 wait=1 让服务端等一小会，
+    // 还在抓就再等几轮（重复请求会合并到同一个后台任务上）
+    const fetchUntilDone = async (call) => {
+        let d = await call(`${query}&wait=1`);
+        for (let i = 0; i < 3 && !d.success && d.pending; i++) {
+            d = await call(`${query}&wait=1`);
+        }
+        return d;
+    };
+
     // Lyrics
     const lrcKey = `2f_cache_lrc_${cacheKeyBase}`;
     const cachedLrc = localStorage.getItem(lrcKey);
     if (cachedLrc) {
         renderLyrics(cachedLrc);
     } else {
-        api.library.lyrics(query).then(d => {
+        fetchUntilDone(api.library.lyrics).then(d => {
             if (d.success && d.lyrics) {
                 localStorage.setItem(lrcKey, d.lyrics);
                 renderLyrics(d.lyrics);
@@ -417,13 +427,13 @@ async function fetchMetadata(track) {
             track.cover = cachedCover;
             applyCover(track.cover);
         } else {
-            api.library.albumArt(query).then(d => {
+            fetchUntilDone(api.library.albumArt).then(d => {
                 if (d.success && d.album_art) {
                     track.cover = toProxyUrl(d.album_art);
                     localStorage.setItem(coverKey, track.cover);
                     applyCover(track.cover);
                 }
-            });
+            }).catch(() => { });
         }
     } else {
         // 已有封面，直接提取颜色